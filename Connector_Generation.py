@@ -1,59 +1,62 @@
 import pandas as pd
 import numpy as np
-from geopy.distance import geodesic
+import argparse
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+import json
 import time
 import os
 
-# Get current directory
-current_dir = os.getcwd()
+from Read_GMNS_Data import CSV_ENGINES, GMNS_TABLE_FORMATS, read_gmns_table, write_gmns_table
+from Stage_Timing import StageTimer, stage
 
-# Path to your shapefile
-current_path = os.path.join(current_dir)
 
-# Define new subdirectory path
-output_path = os.path.join(current_dir, "connected_network")
-# Create the folder if it doesn't exist
-os.makedirs(output_path, exist_ok=True)
+# Step 3 tables read by DTALite, written as CSV whatever the output format
+DTALITE_TABLES = ("link_updated", "node_updated")
 
 
-link_file = os.path.join(current_path, "link.csv")
-node_file = os.path.join(current_path, "node.csv")
-node_taz_file = os.path.join(current_path, "zone_centroid.csv")
-
-# Import CSV files as DataFrames
-link_df = pd.read_csv(link_file)
-#node_df = pd.read_csv(node_file, dtype={'osm_node_id': str})
-node_df = pd.read_csv(node_file)
-node_taz_df = pd.read_csv(node_taz_file)
+def save_network_table(df, output_path, table_name, output_format="csv", csv_engine="pandas", transform=None):
+    """
+    Saves one step 3 table as output_path/<table_name>.<output_format>.
 
-# Display the DataFrame summaries
-#print("Link DataFrame:")
-#print(link_df.head())  # Display the first few rows
-#print("\nNode DataFrame:")
-#print(node_df.head())  # Display the first few rows
-#print("\nNode TAZ DataFrame:")
-#print(node_taz_df.head())  # Display the first few rows
+    Tables in DTALITE_TABLES also get a CSV copy when the output format is columnar. CSV files
+    are streamed in chunks (see write_gmns_csv), and transform, e.g. materialize_link_geometry,
+    is applied chunk by chunk, so writing never holds a formatted copy of the whole table.
 
-# Start timing
-start_time = time.time()
+    Returns:
+        str: Path of the file in output_format.
+    """
+    with stage(f"write {table_name}"):
+        output_file = write_gmns_table(df, os.path.join(output_path, f"{table_name}.{output_format}"),
+                                       csv_engine, transform)
+        if output_format != "csv" and table_name in DTALITE_TABLES:
+            write_gmns_table(df, os.path.join(output_path, f"{table_name}.csv"), csv_engine, transform)
+    return output_file
 
 
 # %%
-def process_and_save_activity_node_data(node_df, node_taz_df, output_path=None):
+def process_and_save_activity_node_data(node_df, node_taz_df, output_path=None, dense_node_ids=False,
+                                        output_format="csv", csv_engine="pandas"):
     """
     Processes node_df by adding new_node_id and filtering rows with non-null zone_id, 
     then saves the filtered DataFrame (activity_node_df) to a CSV file.
 
     Args:
-        node_df (pd.DataFrame): DataFrame containing original node data.
+        node_df (pd.DataFrame): DataFrame containing original node data. It is not modified.
         node_taz_df (pd.DataFrame): DataFrame containing TAZ node data.
-        output_file (str): Path to save the activity_node_df as a CSV file. Default is "activity_node.csv".
+        output_path (str, optional): Folder to save activity_node.csv and common_node.csv in.
+                                     Default is None, which skips saving.
+        dense_node_ids (bool): Number the nodes consecutively after the zones in node_id order,
+                               instead of offsetting node_id, so sparse ids leave no gaps. Default is False.
+        output_format (str): File format of the saved tables, one of GMNS_TABLE_FORMATS. Default is 'csv'.
+        csv_engine (str): CSV writer, one of CSV_ENGINES (see write_gmns_csv). Default is 'pandas'.
 
     Returns:
-        tuple: Updated node_df with new_node_id and activity_node_df.
+        tuple: Copy of node_df with new_node_id, activity_node_df and common_node_df.
     """
     try:
         print("Starting to process node data...")
+        node_df = node_df.copy()
 
         # Step 1: Find the maximum node_id in node_taz_df
         print("Finding the maximum node_id in node_taz_df...")
@@ -63,7 +66,11 @@ def process_and_save_activity_node_data(node_df, node_taz_df, output_path=None):
 
         # Step 2: Add (max_node_id_taz + 1) to all node_ids in node_df
         print("Adding new_node_id to node_df...")        
-        node_df['new_node_id'] = node_df['node_id'] + max_node_id_taz - min_node_id + 1
+        if dense_node_ids:
+            node_ids = node_df['node_id'].to_numpy()
+            node_df['new_node_id'] = np.searchsorted(np.unique(node_ids), node_ids) + max_node_id_taz + 1
+        else:
+            node_df['new_node_id'] = node_df['node_id'] + max_node_id_taz - min_node_id + 1
         print("New node_id generation completed.")
         
 
@@ -75,41 +82,1033 @@ def process_and_save_activity_node_data(node_df, node_taz_df, output_path=None):
         common_node_df = node_df[node_df['zone_id'].isnull()]
         print(f"Filtered {len(common_node_df)} rows with null zone_id.")
 
-        # Step 4: Save the activity_node_df to a CSV file
-        file_name = "activity_node.csv"
-        output_file = os.path.join(output_path, file_name)
-        print(f"Saving activity_node_df to '{output_file}'...")
-        activity_node_df.to_csv(output_file, index=False)
-        print(f"File saved successfully to '{output_file}'.")
-        
-        # Step 5: Save the common_node_df to a CSV file
-        file_name1 = "common_node.csv"
-        output_file1 = os.path.join(output_path, file_name1)
-        print(f"Saving common_node_df to '{output_file1}'...")
-        common_node_df.to_csv(output_file1, index=False)
-        print(f"File saved successfully to '{output_file1}'.")
-        
-        
+        if output_path is not None:
+            # Step 4: Save the activity_node_df to a CSV file
+            print(f"Saving activity_node_df to '{output_path}'...")
+            output_file = save_network_table(activity_node_df, output_path, "activity_node", output_format, csv_engine)
+            print(f"File saved successfully to '{output_file}'.")
+
+            # Step 5: Save the common_node_df to a CSV file
+            print(f"Saving common_node_df to '{output_path}'...")
+            output_file1 = save_network_table(common_node_df, output_path, "common_node", output_format, csv_engine)
+            print(f"File saved successfully to '{output_file1}'.")
+
         # Return the updated DataFrames
         return node_df, activity_node_df, common_node_df
 
     except Exception as e:
         print(f"An error occurred while processing node data: {e}")
+        raise
+
 
 
-updated_node_df, activity_node_df, common_node_df = process_and_save_activity_node_data(node_df, node_taz_df, output_path)
+def map_node_ids(node_ids, old_node_ids, new_node_ids):
+    """
+    Maps node ids through an old -> new table with a sorted-array lookup.
+
+    Args:
+        node_ids (array-like): Ids to map.
+        old_node_ids, new_node_ids (array-like): The mapping table, e.g. 'node_id' and 'new_node_id'.
+
+    Returns:
+        np.ndarray: The new ids, as int64 when every id is found and as float64 with NaN
+                    for the missing ones otherwise.
+    """
+    node_ids = np.asarray(node_ids)
+    old_node_ids = np.asarray(old_node_ids)
+    order = np.argsort(old_node_ids, kind='stable')
+    sorted_old_ids = old_node_ids[order]
+    positions = np.minimum(np.searchsorted(sorted_old_ids, node_ids), len(sorted_old_ids) - 1)
+    found = sorted_old_ids[positions] == node_ids
+    mapped = np.asarray(new_node_ids)[order][positions]
+    if found.all():
+        return mapped.astype(np.int64)
+    return np.where(found, mapped, np.nan)
+
+
+def save_node_id_mapping(updated_node_df, output_path, output_format="csv", csv_engine="pandas"):
+    """
+    Saves the node_id -> new_node_id table of the physical nodes to node_id_mapping.csv.
+
+    Args:
+        updated_node_df (pd.DataFrame): Nodes with 'node_id' and 'new_node_id'.
+        output_path (str): Folder to save node_id_mapping.csv in.
+    """
+    output_file = save_network_table(updated_node_df[['node_id', 'new_node_id']].sort_values('node_id'),
+                                     output_path, "node_id_mapping", output_format, csv_engine)
+    print(f"The node id mapping has been saved to '{output_file}'.")
 
 
 #%%
-def generate_connector_links(activity_node_df, common_node_df, node_taz_df, output_path=None):
+def _query_nearest(query_xy, target_xy, k):
+    """
+    k-nearest KD-tree search where targets at equal distance are ordered by position.
+
+    One neighbour more than needed is fetched to spot ties. The rows with a tie are
+    re-ranked over every target within their k-th distance, so the answer does not depend
+    on how the tree happened to order equidistant targets.
+    """
+    from scipy.spatial import cKDTree
+
+    tree = cKDTree(target_xy)
+    count = k + 1 if len(target_xy) > k else k
+    distances, positions = tree.query(query_xy, k=count)
+    distances = distances.reshape(len(query_xy), count)
+    positions = positions.reshape(len(query_xy), count).astype(np.intp)
+
+    tied = np.flatnonzero(((distances[:, 1:] == distances[:, :-1]) & np.isfinite(distances[:, 1:])).any(axis=1))
+    positions, distances = positions[:, :k].copy(), distances[:, :k].copy()
+    if len(tied):
+        # Squared distances are recomputed for the candidates, so ties compare the same way in every tree
+        kth_distances = np.where(np.isfinite(distances[tied, -1]), distances[tied, -1], np.inf)
+        for row, candidates in zip(tied, tree.query_ball_point(query_xy[tied], r=kth_distances * (1 + 1e-9))):
+            candidates = np.asarray(candidates, dtype=np.intp)
+            squared = ((target_xy[candidates] - query_xy[row]) ** 2).sum(axis=1)
+            nearest = candidates[np.lexsort((candidates, squared))][:k]
+            positions[row, :len(nearest)] = nearest
+            distances[row, :len(nearest)] = np.sqrt(((target_xy[nearest] - query_xy[row]) ** 2).sum(axis=1))
+    return positions, distances
+
+
+def find_k_nearest_nodes(query_x, query_y, target_x, target_y, k):
+    """
+    Finds the k nearest target points for every query point in one batched KD-tree search.
+
+    Args:
+        query_x, query_y (array-like): Coordinates of the query points.
+        target_x, target_y (array-like): Coordinates of the candidate points.
+        k (int): Number of neighbours to return per query point.
+
+    Returns:
+        tuple: (positions, distances) arrays of shape (n_queries, k), ordered by distance and,
+               at equal distance, by target position. Missing neighbours (k larger than the
+               number of targets) have position len(target_x) and distance inf.
+    """
+    query_xy = np.column_stack([np.asarray(query_x, dtype=float), np.asarray(query_y, dtype=float)])
+    target_xy = np.column_stack([np.asarray(target_x, dtype=float), np.asarray(target_y, dtype=float)])
+    if len(query_xy) == 0 or k == 0:
+        return np.empty((len(query_xy), k), dtype=np.intp), np.empty((len(query_xy), k), dtype=float)
+
+    return _query_nearest(query_xy, target_xy, k)
+
+
+def assign_nodes_to_zone_polygons(node_x, node_y, zone_boundary_df, node_taz_df):
+    """
+    Finds the zone polygon containing each node with one bulk STRtree point-in-polygon query.
+
+    Args:
+        node_x, node_y (array-like): Node coordinates (lon/lat).
+        zone_boundary_df (pd.DataFrame): Zone polygons with 'zone_id' and 'geometry' (WKT or
+                                         shapely geometries), as written by Read_Zone_Data.
+        node_taz_df (pd.DataFrame): Zone centroid nodes with 'zone_id'.
+
+    Returns:
+        np.ndarray: Position in node_taz_df of the containing zone for every node, or -1 for
+                    nodes outside every polygon. A node inside several polygons takes the first.
+    """
+    import shapely
+
+    geometry = zone_boundary_df['geometry'].to_numpy()
+    polygons = shapely.from_wkt(geometry) if isinstance(geometry[0], str) else geometry
+    zone_positions = pd.Index(node_taz_df['zone_id']).get_indexer(zone_boundary_df['zone_id'])
+
+    points = shapely.points(np.asarray(node_x, dtype=float), np.asarray(node_y, dtype=float))
+    node_index, polygon_index = shapely.STRtree(polygons).query(points, predicate="within")
+
+    # Resolve nodes matched by several polygons to the lowest polygon position
+    order = np.lexsort((polygon_index, node_index))
+    node_index, polygon_index = node_index[order], polygon_index[order]
+    first = np.unique(node_index, return_index=True)[1]
+
+    containing_positions = np.full(len(points), -1, dtype=np.intp)
+    containing_positions[node_index[first]] = zone_positions[polygon_index[first]]
+    return containing_positions
+
+
+def select_eligible_common_nodes(common_node_df, link_df, link_types):
+    """
+    Keeps the common nodes that are an endpoint of at least one link of the given types.
+
+    Link types are matched against 'link_type_name' when link_df has it, otherwise
+    against the osm2gmns 'facility_type' column (e.g. 'primary', 'residential').
+
+    Args:
+        common_node_df (pd.DataFrame): Candidate nodes with original 'node_id'.
+        link_df (pd.DataFrame): Physical links with original 'from_node_id'/'to_node_id'.
+        link_types (iterable of str): Link types whose nodes may receive connectors.
+
+    Returns:
+        pd.DataFrame: The eligible subset of common_node_df.
+    """
+    type_column = 'link_type_name' if 'link_type_name' in link_df.columns else 'facility_type'
+    eligible_links = link_df[link_df[type_column].isin(list(link_types))]
+    eligible_node_ids = np.union1d(eligible_links['from_node_id'].to_numpy(), eligible_links['to_node_id'].to_numpy())
+    eligible_df = common_node_df[common_node_df['node_id'].isin(eligible_node_ids)]
+    print(f"{len(eligible_df)} of {len(common_node_df)} common nodes are on links of type {sorted(link_types)}.")
+    if eligible_df.empty:
+        raise ValueError(f"No common node lies on a link of type {sorted(link_types)}.")
+    return eligible_df
+
+
+def largest_strongly_connected_node_ids(link_df):
+    """
+    Labels the strongly connected components of the directed link graph in sparse CSR form.
+
+    Returns:
+        tuple: (node_ids, component_count). node_ids are the sorted node ids of the largest component.
+    """
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    from_node_ids = link_df['from_node_id'].to_numpy()
+    to_node_ids = link_df['to_node_id'].to_numpy()
+    graph_node_ids = np.union1d(from_node_ids, to_node_ids)
+    graph = csr_matrix((np.ones(len(link_df), dtype=np.int8),
+                        (np.searchsorted(graph_node_ids, from_node_ids), np.searchsorted(graph_node_ids, to_node_ids))),
+                       shape=(len(graph_node_ids), len(graph_node_ids)))
+    component_count, labels = connected_components(graph, directed=True, connection='strong')
+    return graph_node_ids[labels == np.bincount(labels).argmax()], component_count
+
+
+def select_strongly_connected_nodes(common_node_df, link_df):
+    """
+    Keeps the common nodes in the largest strongly connected component of the physical link graph.
+
+    Connectors attached to dead ends or one-way islands produce OD pairs that cannot be
+    routed; restricting candidates to the giant component avoids them before assignment.
+
+    Args:
+        common_node_df (pd.DataFrame): Candidate nodes with original 'node_id'.
+        link_df (pd.DataFrame): Physical links with original 'from_node_id'/'to_node_id'.
+
+    Returns:
+        pd.DataFrame: The subset of common_node_df inside the largest strongly connected component.
+    """
+    giant_node_ids, component_count = largest_strongly_connected_node_ids(link_df)
+    connected_df = common_node_df[common_node_df['node_id'].isin(giant_node_ids)]
+    print(f"{len(connected_df)} of {len(common_node_df)} common nodes are in the largest of "
+          f"{component_count} strongly connected components.")
+    if connected_df.empty:
+        raise ValueError("No common node lies in the largest strongly connected component.")
+    return connected_df
+
+
+def select_connected_activity_nodes(activity_node_df, link_df):
+    """
+    Marks the activity nodes in the largest strongly connected component of the physical link graph.
+
+    A zone whose activity nodes all lie outside the component is unreachable through its
+    activity connectors, so it also gets a connector to a candidate node inside it
+    (see select_connector_pairs).
+
+    Args:
+        activity_node_df (pd.DataFrame): Activity nodes with original 'node_id'.
+        link_df (pd.DataFrame): Physical links with original 'from_node_id'/'to_node_id'.
+
+    Returns:
+        np.ndarray: Boolean mask aligned with the rows of activity_node_df.
+    """
+    giant_node_ids, _ = largest_strongly_connected_node_ids(link_df)
+    connected = activity_node_df['node_id'].isin(giant_node_ids).to_numpy()
+    print(f"{connected.sum()} of {len(connected)} activity nodes are in the largest strongly connected component.")
+    return connected
+
+
+def select_candidate_nodes(common_node_df, link_df, connector_link_types=None, largest_scc_only=False):
+    """
+    Applies the optional connector link type and connectivity filters to the common nodes.
+
+    Returns:
+        pd.DataFrame: The common nodes that may receive top-up connectors.
+    """
+    candidate_node_df = common_node_df
+    if connector_link_types is not None:
+        candidate_node_df = select_eligible_common_nodes(candidate_node_df, link_df, connector_link_types)
+    if largest_scc_only:
+        candidate_node_df = select_strongly_connected_nodes(candidate_node_df, link_df)
+    return candidate_node_df
+
+
+def prepare_link_snapping(link_df, updated_node_df, link_types=None, largest_scc_only=False):
+    """
+    Indexes the physical links that zone centroids may be snapped to in an STRtree.
+
+    Args:
+        link_df (pd.DataFrame): Physical links with original node ids and WKT 'geometry'.
+        updated_node_df (pd.DataFrame): Nodes with 'node_id' and 'new_node_id'.
+        link_types (iterable of str, optional): Only snap to links of these types (see
+                                                select_eligible_common_nodes). Default is None (all links).
+        largest_scc_only (bool): Only snap to links inside the largest strongly connected component.
+
+    Returns:
+        dict: 'tree' and 'lines' of the eligible links, their 'link_positions' in link_df, the
+              new ids of their end nodes ('from_node_ids', 'to_node_ids') and 'first_node_id',
+              the new id given to the first node created by a split.
+    """
+    import shapely
+
+    eligible = np.ones(len(link_df), dtype=bool)
+    if link_types is not None:
+        type_column = 'link_type_name' if 'link_type_name' in link_df.columns else 'facility_type'
+        eligible &= link_df[type_column].isin(list(link_types)).to_numpy()
+    if largest_scc_only:
+        giant_node_ids, _ = largest_strongly_connected_node_ids(link_df)
+        eligible &= (link_df['from_node_id'].isin(giant_node_ids) & link_df['to_node_id'].isin(giant_node_ids)).to_numpy()
+    link_positions = np.flatnonzero(eligible)
+    if len(link_positions) == 0:
+        raise ValueError("No link is eligible for snapping zone centroids.")
+    print(f"Indexing {len(link_positions)} of {len(link_df)} links for snapping zone centroids...")
+
+    eligible_links = link_df.iloc[link_positions]
+    old_node_ids, new_node_ids = updated_node_df['node_id'].to_numpy(), updated_node_df['new_node_id'].to_numpy()
+    lines = shapely.from_wkt(eligible_links['geometry'].to_numpy())
+    return {
+        'tree': shapely.STRtree(lines),
+        'lines': lines,
+        'link_positions': link_positions,
+        'from_node_ids': map_node_ids(eligible_links['from_node_id'].to_numpy(), old_node_ids, new_node_ids),
+        'to_node_ids': map_node_ids(eligible_links['to_node_id'].to_numpy(), old_node_ids, new_node_ids),
+        'first_node_id': int(updated_node_df['new_node_id'].max()) + 1,
+    }
+
+
+def _snap_points_to_links(x, y, link_snap):
+    """
+    Projects points onto their nearest eligible link (see prepare_link_snapping).
+
+    Points projecting onto a link end reuse its end node; the others get a new node id,
+    shared by points that project onto the same spot.
+
+    Returns:
+        tuple: (node_ids, node_xs, node_ys, split_links, split_fractions). split_links is the
+               position in link_df of the link to split at each new node, or -1 where an
+               existing node is reused; split_fractions is the normalized position along it.
+    """
+    import shapely
+
+    points = shapely.points(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+    point_index, line_index = link_snap['tree'].query_nearest(points, all_matches=False)
+    line_index = line_index[np.argsort(point_index, kind='stable')]
+    lines = link_snap['lines'][line_index]
+    fractions = shapely.line_locate_point(lines, points, normalized=True)
+    snapped = shapely.line_interpolate_point(lines, fractions, normalized=True)
+
+    at_start, at_end = fractions <= 1e-9, fractions >= 1 - 1e-9
+    is_split = ~(at_start | at_end)
+    node_ids = np.where(at_start, link_snap['from_node_ids'][line_index], link_snap['to_node_ids'][line_index])
+    _, split_key = np.unique(np.column_stack([line_index[is_split], fractions[is_split]]), axis=0,
+                             return_inverse=True)
+    node_ids[is_split] = link_snap['first_node_id'] + split_key.ravel()
+    split_links = np.where(is_split, link_snap['link_positions'][line_index], -1)
+    return node_ids, shapely.get_x(snapped), shapely.get_y(snapped), split_links, fractions
+
+
+# Fraction of the line length within which a vertex counts as lying on a cut point
+SUBSTRING_TOLERANCE = 1e-9
+
+
+def _line_substrings(lines, start_fractions, end_fractions):
+    """
+    Cuts the parts between normalized start and end positions out of shapely line strings.
+
+    Returns:
+        np.ndarray: The substrings as shapely line strings.
+    """
+    import shapely
+
+    coords, vertex_line = shapely.get_coordinates(lines, return_index=True)
+    step = np.hypot(*np.diff(coords, axis=0, prepend=coords[:1]).T)
+    line_first_vertex = np.searchsorted(vertex_line, np.arange(len(lines)))
+    step[line_first_vertex] = 0.0
+    travelled = np.cumsum(step)
+    travelled -= travelled[line_first_vertex][vertex_line]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        vertex_fraction = np.nan_to_num(travelled / shapely.length(lines)[vertex_line])
+
+    # Interior vertices strictly between the cut points, bracketed by the interpolated ends. The
+    # first and last vertex are picked out by position, since the accumulated fraction of the
+    # last one can fall just short of 1, and vertices within SUBSTRING_TOLERANCE of a cut point
+    # are left to the interpolated end, so no piece repeats a coordinate
+    vertex_count = np.bincount(vertex_line, minlength=len(lines))
+    substring_index = np.repeat(np.arange(len(lines)), vertex_count)
+    vertex_position = np.arange(len(substring_index)) - np.repeat(np.cumsum(vertex_count) - vertex_count, vertex_count)
+    vertex_index = vertex_position + line_first_vertex[substring_index]
+    inside = (vertex_position > 0) & (vertex_position < vertex_count[substring_index] - 1) & \
+             (vertex_fraction[vertex_index] > start_fractions[substring_index] + SUBSTRING_TOLERANCE) & \
+             (vertex_fraction[vertex_index] < end_fractions[substring_index] - SUBSTRING_TOLERANCE)
+    starts = shapely.get_coordinates(shapely.line_interpolate_point(lines, start_fractions, normalized=True))
+    ends = shapely.get_coordinates(shapely.line_interpolate_point(lines, end_fractions, normalized=True))
+
+    all_index = np.concatenate([np.arange(len(lines)), substring_index[inside], np.arange(len(lines))])
+    all_order = np.concatenate([np.full(len(lines), -1), vertex_index[inside], np.full(len(lines), len(coords))])
+    all_coords = np.concatenate([starts, coords[vertex_index[inside]], ends])
+    order = np.lexsort((all_order, all_index))
+    return shapely.linestrings(all_coords[order], indices=all_index[order])
+
+
+def split_links_at_connectors(link_df, updated_node_df, connector_links_df):
+    """
+    Splits the physical links that snapped connectors attach to, adding the new nodes.
+
+    Every new node splits its link and, when present, the reverse link between the same
+    nodes. The pieces keep the attributes of the link they came from, with their length
+    prorated (vdf_fftt and vdf_length_mi follow from it in update_and_merge_links).
+
+    Args:
+        link_df (pd.DataFrame): Physical links with original node ids. It is not modified.
+        updated_node_df (pd.DataFrame): Nodes with 'node_id' and 'new_node_id'. It is not modified.
+        connector_links_df (pd.DataFrame): Connector links, whose split columns locate the new nodes.
+
+    Returns:
+        tuple: (link_df, updated_node_df) with the split links replaced and the new nodes appended.
+    """
+    import shapely
+
+    if '_split_link' not in connector_links_df.columns:
+        return link_df, updated_node_df
+
+    # Both directions of a connector carry the split; keep the node -> zone row, which comes first
+    node_first_links = connector_links_df.iloc[::2]
+    splits = node_first_links[node_first_links['_split_link'] >= 0].drop_duplicates('from_node_id')
+    if splits.empty:
+        return link_df, updated_node_df
+    new_node_ids = splits['from_node_id'].to_numpy()
+    node_ids = int(updated_node_df['node_id'].max()) + 1 + np.arange(len(splits))
+    new_node_df = pd.DataFrame({'node_id': node_ids, 'new_node_id': new_node_ids,
+                                'x_coord': splits['_from_x'].to_numpy(), 'y_coord': splits['_from_y'].to_numpy()})
+    print(f"Splitting links at {len(new_node_df)} snapped connector nodes...")
+
+    # Step 1: Add the reverse link of every split link, split at the mirrored position
+    link_positions = splits['_split_link'].to_numpy(dtype=np.intp)
+    fractions = splits['_split_fraction'].to_numpy()
+    from_node_ids = link_df['from_node_id'].to_numpy()
+    to_node_ids = link_df['to_node_id'].to_numpy()
+    reverse_positions = pd.Series(np.arange(len(link_df)), index=pd.MultiIndex.from_arrays([to_node_ids, from_node_ids]))
+    reverse_positions = reverse_positions[~reverse_positions.index.duplicated()]
+    twins = reverse_positions.reindex(pd.MultiIndex.from_arrays(
+        [from_node_ids[link_positions], to_node_ids[link_positions]])).to_numpy()
+    has_twin = ~np.isnan(twins)
+    link_positions = np.concatenate([link_positions, twins[has_twin].astype(np.intp)])
+    fractions = np.concatenate([fractions, 1 - fractions[has_twin]])
+    node_ids = np.concatenate([node_ids, node_ids[has_twin]])
+    unique_splits = pd.DataFrame({'link': link_positions, 'fraction': fractions}).duplicated().to_numpy()
+    link_positions, fractions, node_ids = link_positions[~unique_splits], fractions[~unique_splits], node_ids[~unique_splits]
+
+    # Step 2: Cut each link into consecutive pieces between its original ends and the new nodes
+    order = np.lexsort((fractions, link_positions))
+    link_positions, fractions, node_ids = link_positions[order], fractions[order], node_ids[order]
+    first_in_link = np.r_[True, link_positions[1:] != link_positions[:-1]]
+    last_in_link = np.r_[link_positions[1:] != link_positions[:-1], True]
+    piece_links = np.concatenate([link_positions, link_positions[last_in_link]])
+    piece_starts = np.concatenate([np.where(first_in_link, 0.0, np.r_[0.0, fractions[:-1]]), fractions[last_in_link]])
+    piece_ends = np.concatenate([fractions, np.ones(last_in_link.sum())])
+    piece_from = np.concatenate([np.where(first_in_link, from_node_ids[link_positions], np.r_[0, node_ids[:-1]]),
+                                 node_ids[last_in_link]])
+    piece_to = np.concatenate([node_ids, to_node_ids[link_positions[last_in_link]]])
+
+    pieces_df = link_df.iloc[piece_links].copy()
+    pieces_df['from_node_id'] = piece_from
+    pieces_df['to_node_id'] = piece_to
+    pieces_df['length'] = (pieces_df['length'].to_numpy() * (piece_ends - piece_starts)).round(2)
+    lines = shapely.from_wkt(pieces_df['geometry'].to_numpy())
+    pieces_df['geometry'] = shapely.to_wkt(_line_substrings(lines, piece_starts, piece_ends), rounding_precision=-1)
+
+    kept = np.ones(len(link_df), dtype=bool)
+    kept[link_positions] = False
+    link_df = pd.concat([link_df[kept], pieces_df], ignore_index=True)
+    updated_node_df = pd.concat([updated_node_df, new_node_df], ignore_index=True)
+    return link_df, updated_node_df
+
+
+# WGS84 ellipsoid and mean Earth radius (meters) used by compute_link_lengths
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = (1 - WGS84_F) * WGS84_A
+EARTH_RADIUS = 6371008.8
+
+LENGTH_METHODS = ("vincenty", "haversine", "geodesic", "projected")
+
+
+def compute_link_lengths(from_x, from_y, to_x, to_y, method="vincenty"):
+    """
+    Computes the length in meters of straight links given as lon/lat coordinate arrays.
+
+    Args:
+        from_x, from_y (array-like): Longitude and latitude of the link start points.
+        to_x, to_y (array-like): Longitude and latitude of the link end points.
+        method (str): 'vincenty' solves the WGS84 inverse problem in NumPy (sub-millimetre
+                      agreement with geodesic); 'haversine' uses a sphere of mean radius
+                      (fastest, up to ~0.6% error); 'geodesic' calls geopy for every link and is
+                      kept as the exact reference; 'projected' projects the points to the UTM zone
+                      of their median (see project_to_local_utm) and takes planar distances
+                      (below 0.1% error inside the zone). One of LENGTH_METHODS.
+
+    Returns:
+        np.ndarray: Link lengths in meters.
+    """
+    from_x = np.asarray(from_x, dtype=float)
+    from_y = np.asarray(from_y, dtype=float)
+    to_x = np.asarray(to_x, dtype=float)
+    to_y = np.asarray(to_y, dtype=float)
+
+    if method == "geodesic":
+        from geopy.distance import geodesic
+
+        return np.array([geodesic((y1, x1), (y2, x2)).meters
+                         for x1, y1, x2, y2 in zip(from_x, from_y, to_x, to_y)], dtype=float)
+
+    if method == "projected":
+        (from_x, from_y), (to_x, to_y) = project_to_local_utm((from_x, from_y), (to_x, to_y))[0]
+        return np.hypot(to_x - from_x, to_y - from_y)
+
+    lon1, lat1, lon2, lat2 = map(np.radians, (from_x, from_y, to_x, to_y))
+
+    if method == "haversine":
+        h = (np.sin((lat2 - lat1) / 2) ** 2
+             + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+        return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+    if method != "vincenty":
+        raise ValueError(f"Unknown length method '{method}'. Expected one of {LENGTH_METHODS}.")
+
+    f = WGS84_F
+    L = lon2 - lon1
+    U1 = np.arctan((1 - f) * np.tan(lat1))
+    U2 = np.arctan((1 - f) * np.tan(lat2))
+    sin_U1, cos_U1 = np.sin(U1), np.cos(U1)
+    sin_U2, cos_U2 = np.sin(U2), np.cos(U2)
+
+    lam = L.copy()
+    converged = np.zeros(L.shape, dtype=bool)
+    sin_sigma = cos_sigma = sigma = cos2_alpha = cos_2sigma_m = np.zeros(L.shape)
+    for _ in range(200):
+        sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+        sin_sigma = np.hypot(cos_U2 * sin_lam, cos_U1 * sin_U2 - sin_U1 * cos_U2 * cos_lam)
+        cos_sigma = sin_U1 * sin_U2 + cos_U1 * cos_U2 * cos_lam
+        sigma = np.arctan2(sin_sigma, cos_sigma)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cos_U1 * cos_U2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            # Equatorial lines have cos2_alpha == 0 and no meaningful cos_2sigma_m
+            cos_2sigma_m = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sin_U1 * sin_U2 / cos2_alpha)
+        C = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+        lam_prev = lam
+        lam = L + (1 - C) * f * sin_alpha * (
+            sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)))
+        converged = np.abs(lam - lam_prev) < 1e-12
+        if converged.all():
+            break
+
+    u_sq = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+    A = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+    B = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+    delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (
+        cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+        - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)))
+    lengths = WGS84_B * A * (sigma - delta_sigma)
+
+    # Vincenty does not converge for nearly antipodal points; solve those exactly
+    if not converged.all():
+        failed = ~converged
+        lengths[failed] = compute_link_lengths(from_x[failed], from_y[failed], to_x[failed], to_y[failed],
+                                               method="geodesic")
+    return lengths
+
+
+def project_to_local_utm(*coordinate_pairs, epsg=None):
+    """
+    Projects lon/lat coordinate arrays into the UTM zone that contains their median point.
+
+    All pairs share one projection, so distances between them are planar distances in meters
+    (scale error below 0.1% inside the zone, which covers a state-sized network).
+
+    Args:
+        *coordinate_pairs: (x, y) tuples of longitude and latitude arrays.
+        epsg (int, optional): Projection to use instead of selecting one.
+
+    Returns:
+        tuple: (projected_pairs, epsg). projected_pairs is a list of float64 (x, y) tuples in
+               meters, in the order given; epsg is the EPSG code of the selected UTM zone.
+    """
+    from pyproj import Transformer
+
+    all_x = np.concatenate([np.asarray(x, dtype=float) for x, _ in coordinate_pairs])
+    all_y = np.concatenate([np.asarray(y, dtype=float) for _, y in coordinate_pairs])
+    if epsg is None:
+        lon, lat = np.median(all_x), np.median(all_y)
+        utm_zone = int(np.clip(np.floor((lon + 180) / 6) + 1, 1, 60))
+        epsg = (32600 if lat >= 0 else 32700) + utm_zone
+
+    transformer = Transformer.from_crs("EPSG:4326", f"EPSG:{epsg}", always_xy=True)
+    projected_x, projected_y = transformer.transform(all_x, all_y)
+    split_at = np.cumsum([len(x) for x, _ in coordinate_pairs])[:-1]
+    projected_pairs = list(zip(np.split(np.asarray(projected_x, dtype=np.float64), split_at),
+                               np.split(np.asarray(projected_y, dtype=np.float64), split_at)))
+    return projected_pairs, epsg
+
+
+# Derived link attributes in output order, as (column, dtype, rule). A rule is a constant, or
+# a function of the 'length' and 'free_speed' arrays and of the attributes derived before it.
+# Empty columns use nullable dtypes, so they take a validity mask instead of an object array of None.
+LINK_ATTRIBUTE_RULES = [
+    ("vdf_toll", np.int8, 0),
+    ("allowed_uses", "string", None),
+    ("vdf_alpha", np.float64, 0.15),
+    ("vdf_beta", np.int8, 4),
+    ("vdf_plf", np.int8, 1),
+    ("vdf_length_mi", np.float64, lambda a: np.round(a['length'] / 1609, 2)),
+    ("vdf_free_speed_mph", np.float64, lambda a: np.round(a['free_speed'] / 1.60934 / 5) * 5),
+    ("free_speed_in_mph_raw", np.float64, lambda a: np.round(a['vdf_free_speed_mph'] / 5) * 5),
+    ("vdf_fftt", np.float64, lambda a: np.round(a['length'] / a['free_speed'] * 0.06, 2)),
+    ("ref_volume", "Float32", None),
+    ("base_volume", "Float32", None),
+    ("base_vol_auto", "Float32", None),
+    ("restricted_turn_nodes", "string", None),
+]
+LINK_ATTRIBUTE_COLUMNS = [name for name, _, _ in LINK_ATTRIBUTE_RULES]
+
+
+def derive_link_attributes(links_df):
+    """
+    Sets the VDF and placeholder columns of LINK_ATTRIBUTE_RULES on links_df in one pass.
+
+    Args:
+        links_df (pd.DataFrame): Links with 'length' (meters) and 'free_speed' (km/h). It is modified in place.
+
+    Returns:
+        pd.DataFrame: links_df with the derived columns, replacing any existing ones.
+    """
+    arrays = {'length': links_df['length'].to_numpy(dtype=np.float64),
+              'free_speed': links_df['free_speed'].to_numpy(dtype=np.float64)}
+    derived = {}
+    for name, dtype, rule in LINK_ATTRIBUTE_RULES:
+        if callable(rule):
+            arrays[name] = rule(arrays).astype(dtype)
+            derived[name] = arrays[name]
+        elif rule is None:
+            derived[name] = pd.array(np.full(len(links_df), pd.NA), dtype=dtype)
+        else:
+            derived[name] = np.full(len(links_df), rule, dtype=dtype)
+    for name, values in derived.items():
+        links_df[name] = values
+    return links_df
+
+
+# Private columns carrying connector end-point coordinates until geometry is written
+CONNECTOR_COORD_COLUMNS = ['_from_x', '_from_y', '_to_x', '_to_y']
+# Private columns locating the link split by a snapped connector (see split_links_at_connectors)
+CONNECTOR_SPLIT_COLUMNS = ['_split_link', '_split_fraction']
+
+
+def _create_connector_links_df(connector_pairs):
+    """
+    Creates the bi-directional connector link table from zone-node pairs.
+
+    Each pair yields two links: zone -> node followed by node -> zone when 'zone_first'
+    is set, and the reverse order otherwise. The 'geometry' column is left empty; it is
+    filled from the coordinate columns by materialize_link_geometry when the links are written.
+    """
+    def interleave(forward, backward):
+        return np.column_stack([forward, backward]).ravel()
+
+    zone_first = connector_pairs['zone_first']
+    from_ids = np.where(zone_first, connector_pairs['zone_id'], connector_pairs['node_id'])
+    to_ids = np.where(zone_first, connector_pairs['node_id'], connector_pairs['zone_id'])
+    from_xs = np.where(zone_first, connector_pairs['zone_x'], connector_pairs['node_x'])
+    from_ys = np.where(zone_first, connector_pairs['zone_y'], connector_pairs['node_y'])
+    to_xs = np.where(zone_first, connector_pairs['node_x'], connector_pairs['zone_x'])
+    to_ys = np.where(zone_first, connector_pairs['node_y'], connector_pairs['zone_y'])
+    lengths = connector_pairs['length']
+
+    connector_links_df = pd.DataFrame({
+        "link_id": np.arange(1, 2 * len(lengths) + 1),
+        "from_node_id": interleave(from_ids, to_ids),
+        "to_node_id": interleave(to_ids, from_ids),
+        "dir_flag": 1,
+        "length": interleave(lengths, lengths),
+        "lanes": 1,
+        "free_speed": 90,
+        "capacity": 99999,
+        "link_type_name": "connector",
+        "link_type": 0,
+        "geometry": None,
+        "allowed_uses": "auto",
+        "from_biway": 1,
+        "is_link": 0,
+        "_from_x": interleave(from_xs, to_xs),
+        "_from_y": interleave(from_ys, to_ys),
+        "_to_x": interleave(to_xs, from_xs),
+        "_to_y": interleave(to_ys, from_ys),
+    })
+    if 'split_link' in connector_pairs:
+        connector_links_df["_split_link"] = interleave(connector_pairs['split_link'], connector_pairs['split_link'])
+        connector_links_df["_split_fraction"] = interleave(connector_pairs['split_fraction'],
+                                                           connector_pairs['split_fraction'])
+
+    # Step3.5 Add new columns
+    return derive_link_attributes(connector_links_df)
+
+
+def materialize_link_geometry(links_df):
+    """
+    Returns a copy of links_df ready for writing, with the WKT LINESTRING of every
+    connector built from its coordinate columns and those and the split columns dropped.
+
+    Args:
+        links_df (pd.DataFrame): Link table that may carry connector coordinate columns.
+
+    Returns:
+        pd.DataFrame: Link table with a complete 'geometry' column.
+    """
+    if not set(CONNECTOR_COORD_COLUMNS).issubset(links_df.columns):
+        return links_df
+
+    links_df = links_df.copy()
+    from_x, from_y, to_x, to_y = (links_df[column] for column in CONNECTOR_COORD_COLUMNS)
+    pending = links_df['geometry'].isna() & from_x.notna()
+    if pending.any():
+        links_df.loc[pending, 'geometry'] = (
+            "LINESTRING (" + from_x[pending].astype(str) + " " + from_y[pending].astype(str) + ", "
+            + to_x[pending].astype(str) + " " + to_y[pending].astype(str) + ")")
+    return links_df.drop(columns=CONNECTOR_COORD_COLUMNS + CONNECTOR_SPLIT_COLUMNS, errors='ignore')
+
+
+def _query_tile(task):
+    """
+    Process pool worker: k-nearest search for the queries of one tile against the
+    candidates inside the tile's halo box.
+
+    Returns:
+        tuple: (positions, distances, exact) where positions index the full target arrays and
+               exact marks queries whose k-th neighbour is closer than the halo box edge, so
+               that no candidate outside the box can beat it.
+    """
+    query_x, query_y, target_x, target_y, target_positions, k, box = task
+    if len(target_x) == 0:
+        return (np.zeros((len(query_x), k), dtype=np.intp), np.full((len(query_x), k), np.inf),
+                np.zeros(len(query_x), dtype=bool))
+
+    positions, distances = find_k_nearest_nodes(query_x, query_y, target_x, target_y, k)
+    found = positions < len(target_x)
+    positions = target_positions[np.where(found, positions, 0)]
+
+    min_x, min_y, max_x, max_y = box
+    margin = np.minimum.reduce([query_x - min_x, max_x - query_x, query_y - min_y, max_y - query_y])
+    exact = found.all(axis=1) & (distances[:, -1] < margin)
+    return positions, distances, exact
+
+
+def find_k_nearest_nodes_tiled(query_x, query_y, target_x, target_y, k, tile_size, executor, tile_halo=None):
+    """
+    Tiled version of find_k_nearest_nodes that spreads the search over a process pool.
+
+    Queries are partitioned into square tiles of side tile_size. Each tile only searches the
+    targets inside the tile grown by a halo of tile_halo (default: tile_size). A tile answer
+    is kept when its k-th neighbour lies closer than the halo edge, which makes it the global
+    answer. The remaining queries are answered by one global search. Every query belongs to
+    exactly one tile and results come back in query order, so the output does not depend on
+    the tiling or the number of workers.
+
+    Args:
+        query_x, query_y, target_x, target_y, k: As for find_k_nearest_nodes.
+        tile_size (float): Tile side in coordinate units.
+        executor (concurrent.futures.Executor): Pool running the tile searches.
+        tile_halo (float, optional): Halo width in coordinate units. Default is tile_size.
+
+    Returns:
+        tuple: (positions, distances) arrays of shape (n_queries, k), as for find_k_nearest_nodes.
+    """
+    query_x = np.asarray(query_x, dtype=float)
+    query_y = np.asarray(query_y, dtype=float)
+    target_x = np.asarray(target_x, dtype=float)
+    target_y = np.asarray(target_y, dtype=float)
+    tile_halo = tile_size if tile_halo is None else tile_halo
+    if len(query_x) == 0 or k == 0:
+        return find_k_nearest_nodes(query_x, query_y, target_x, target_y, k)
+
+    # Group queries by tile; targets are sorted by x so each halo box is a slice plus a y mask
+    origin_x, origin_y = query_x.min(), query_y.min()
+    tile_x = np.floor((query_x - origin_x) / tile_size).astype(np.int64)
+    tile_y = np.floor((query_y - origin_y) / tile_size).astype(np.int64)
+    tile_keys, tile_index = np.unique(tile_x * (tile_y.max() + 1) + tile_y, return_inverse=True)
+    query_order = np.argsort(tile_index, kind="stable")
+    tile_starts = np.searchsorted(tile_index[query_order], np.arange(len(tile_keys) + 1))
+    target_order = np.argsort(target_x, kind="stable")
+    sorted_target_x = target_x[target_order]
+
+    tasks = []
+    for tile in range(len(tile_keys)):
+        queries = query_order[tile_starts[tile]:tile_starts[tile + 1]]
+        core_x = origin_x + tile_x[queries[0]] * tile_size
+        core_y = origin_y + tile_y[queries[0]] * tile_size
+        box = (core_x - tile_halo, core_y - tile_halo, core_x + tile_size + tile_halo, core_y + tile_size + tile_halo)
+        first, last = np.searchsorted(sorted_target_x, [box[0], box[2]], side="left")
+        candidates = target_order[first:last]
+        candidates = np.sort(candidates[(target_y[candidates] >= box[1]) & (target_y[candidates] <= box[3])])
+        tasks.append((query_x[queries], query_y[queries], target_x[candidates], target_y[candidates],
+                      candidates, k, box))
+
+    positions = np.empty((len(query_x), k), dtype=np.intp)
+    distances = np.empty((len(query_x), k), dtype=float)
+    exact = np.empty(len(query_x), dtype=bool)
+    for tile, (tile_positions, tile_distances, tile_exact) in enumerate(executor.map(_query_tile, tasks)):
+        queries = query_order[tile_starts[tile]:tile_starts[tile + 1]]
+        positions[queries], distances[queries], exact[queries] = tile_positions, tile_distances, tile_exact
+
+    # Queries whose neighbours might lie beyond the halo are answered globally
+    if not exact.all():
+        print(f"{(~exact).sum()} of {len(exact)} queries reach beyond their tile halo; searching them globally.")
+        positions[~exact], distances[~exact] = find_k_nearest_nodes(
+            query_x[~exact], query_y[~exact], target_x, target_y, k)
+    return positions, distances
+
+
+def _search_nearest(query_x, query_y, target_x, target_y, k, executor=None, workers=1, tile_size=None):
+    """Runs find_k_nearest_nodes, tiled over executor when one is given."""
+    if executor is None:
+        return find_k_nearest_nodes(query_x, query_y, target_x, target_y, k)
+    if tile_size is None:
+        # Aim for about four tiles per worker over the query extent
+        span = max(np.ptp(query_x), np.ptp(query_y), 1e-9) if len(query_x) else 1.0
+        tile_size = span / np.ceil(np.sqrt(4 * workers))
+    return find_k_nearest_nodes_tiled(query_x, query_y, target_x, target_y, k, tile_size, executor)
+
+
+def _compute_lengths_chunk(task):
+    """Process pool worker for compute_link_lengths on one chunk of links."""
+    from_x, from_y, to_x, to_y, method = task
+    return compute_link_lengths(from_x, from_y, to_x, to_y, method=method)
+
+
+def _compute_lengths(from_x, from_y, to_x, to_y, method, executor=None, workers=1):
+    """
+    Runs compute_link_lengths, split into one chunk per worker when executor is given. Method
+    None takes planar distances of coordinates already projected to meters.
+    """
+    if method is None:
+        return np.hypot(to_x - from_x, to_y - from_y)
+    if executor is None or len(from_x) == 0:
+        return compute_link_lengths(from_x, from_y, to_x, to_y, method=method)
+    chunks = np.array_split(np.arange(len(from_x)), workers)
+    tasks = [(from_x[chunk], from_y[chunk], to_x[chunk], to_y[chunk], method) for chunk in chunks]
+    return np.concatenate(list(executor.map(_compute_lengths_chunk, tasks)))
+
+
+def select_connector_pairs(activity_node_df, common_node_df, node_taz_df, length_method="vincenty",
+                           connectors_per_zone=1, connector_radius=None, zone_boundary_df=None,
+                           workers=None, tile_size=None, link_snap=None, connected_activity_nodes=None):
+    """
+    Selects the zone-node pairs to connect and measures them (see generate_connector_links).
+
+    With length_method='projected' all coordinates are projected once to the local UTM zone,
+    and the nearest-neighbour searches and lengths are planar in meters.
+
+    With workers > 1 the nearest-neighbour searches run on spatial tiles in a process pool
+    (see find_k_nearest_nodes_tiled) and lengths are computed in chunks on the same pool.
+    The result is identical to the single-process one.
+
+    With link_snap (see prepare_link_snapping), zones without an activity node are connected
+    to the nearest point of the nearest eligible link instead of its nearest common node.
+
+    With connected_activity_nodes (see select_connected_activity_nodes), a zone none of whose
+    activity nodes is marked is topped up with at least one common node connector, as if it
+    had no activity node.
+
+    Returns:
+        tuple: (connector_pairs, ave_pair_length). connector_pairs is a dict of aligned arrays
+               'zone_id', 'zone_x', 'zone_y', 'node_id', 'node_x', 'node_y', 'length' and
+               'zone_first', with activity node pairs first followed by common node pairs in zone order.
+               With link_snap it also has 'split_link' and 'split_fraction' (see _snap_points_to_links).
+    """
+    if link_snap is not None and connectors_per_zone > 1:
+        raise ValueError("Snapping to links supports one connector per zone only.")
+    if workers is not None and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return _select_connector_pairs(activity_node_df, common_node_df, node_taz_df, length_method,
+                                           connectors_per_zone, connector_radius, zone_boundary_df,
+                                           executor, workers, tile_size, link_snap, connected_activity_nodes)
+    return _select_connector_pairs(activity_node_df, common_node_df, node_taz_df, length_method,
+                                   connectors_per_zone, connector_radius, zone_boundary_df, link_snap=link_snap,
+                                   connected_activity_nodes=connected_activity_nodes)
+
+
+def _select_connector_pairs(activity_node_df, common_node_df, node_taz_df, length_method, connectors_per_zone,
+                            connector_radius, zone_boundary_df, executor=None, workers=1, tile_size=None,
+                            link_snap=None, connected_activity_nodes=None):
+    taz_node_ids = node_taz_df['node_id'].to_numpy()
+    taz_node_xs = node_taz_df['x_coord'].to_numpy()
+    taz_node_ys = node_taz_df['y_coord'].to_numpy()
+
+    activity_node_ids = activity_node_df['new_node_id'].to_numpy()
+    activity_node_xs = activity_node_df['x_coord'].to_numpy()
+    activity_node_ys = activity_node_df['y_coord'].to_numpy()
+    common_node_ids = common_node_df['new_node_id'].to_numpy()
+    common_node_xs = common_node_df['x_coord'].to_numpy()
+    common_node_ys = common_node_df['y_coord'].to_numpy()
+
+    # Searches and lengths run on (taz_xs, taz_ys), (activity_xs, ...) and (common_xs, ...):
+    # the lon/lat arrays themselves, or their projection to meters
+    epsg = None
+    if length_method == "projected":
+        with stage("project coordinates"):
+            projected_pairs, epsg = project_to_local_utm(
+                (taz_node_xs, taz_node_ys), (activity_node_xs, activity_node_ys), (common_node_xs, common_node_ys))
+        print(f"Projected node coordinates to EPSG:{epsg}.")
+        (taz_xs, taz_ys), (activity_xs, activity_ys), (common_xs, common_ys) = projected_pairs
+        # The coordinates are in meters now, so lengths are planar (see _compute_lengths)
+        length_method = None
+    else:
+        taz_xs, taz_ys = taz_node_xs, taz_node_ys
+        activity_xs, activity_ys = activity_node_xs, activity_node_ys
+        common_xs, common_ys = common_node_xs, common_node_ys
+
+    # Step 1: Calculate the nearest TAZ node for each activity node
+    print("Calculating nearest TAZ nodes for activity nodes...")
+    with stage("nearest centroid search"):
+        if zone_boundary_df is None:
+            nearest_taz_positions = _search_nearest(activity_xs, activity_ys, taz_xs, taz_ys, 1,
+                                                    executor, workers, tile_size)[0][:, 0]
+        else:
+            print("Assigning activity nodes to their containing zone polygons...")
+            nearest_taz_positions = assign_nodes_to_zone_polygons(
+                activity_node_xs, activity_node_ys, zone_boundary_df, node_taz_df)
+            outside = nearest_taz_positions < 0
+            print(f"{outside.sum()} activity nodes lie outside every zone polygon; using their nearest centroid.")
+            nearest_taz_positions[outside] = _search_nearest(
+                activity_xs[outside], activity_ys[outside], taz_xs, taz_ys, 1,
+                executor, workers, tile_size)[0][:, 0]
+
+    # Connector lengths are symmetric, so one vectorized pass covers both directions
+    with stage("activity connector lengths"):
+        activity_pair_lengths = _compute_lengths(
+            taz_xs[nearest_taz_positions], taz_ys[nearest_taz_positions],
+            activity_xs, activity_ys, length_method, executor, workers)
+
+    print("Calculating nearest activity nodes for taz nodes...")       
+    ave_pair_length = activity_pair_lengths.mean()
+    print(f"ave pair length: '{ave_pair_length}' meters.")
+
+    # Zones with enough activity connectors are skipped; the rest are topped up
+    # from their nearest common nodes in a single batched k-nearest query
+    activity_connector_count = np.bincount(nearest_taz_positions, minlength=len(taz_node_ids))
+    connectors_needed = np.maximum(connectors_per_zone - activity_connector_count, 0)
+    if connected_activity_nodes is not None:
+        # Activity connectors outside the connected nodes do not count as connecting the zone
+        activity_connector_count = np.bincount(nearest_taz_positions[connected_activity_nodes],
+                                               minlength=len(taz_node_ids))
+        unconnected = (activity_connector_count == 0) & (connectors_needed == 0)
+        print(f"{unconnected.sum()} zones have only unconnected activity nodes; adding a connector to each.")
+        connectors_needed[unconnected] = 1
+    zone_positions = np.flatnonzero(connectors_needed > 0)
+    if link_snap is not None:
+        with stage("snap zones to links"):
+            return _select_snapped_pairs(
+                activity_node_ids, activity_node_xs, activity_node_ys, activity_pair_lengths, nearest_taz_positions,
+                taz_node_ids, taz_node_xs, taz_node_ys, taz_xs, taz_ys, zone_positions, link_snap, length_method, epsg,
+                executor, workers), ave_pair_length
+    k = int(connectors_needed.max()) if len(zone_positions) else 0
+    with stage("nearest common node search"):
+        candidate_positions, _ = _search_nearest(
+            taz_xs[zone_positions], taz_ys[zone_positions], common_xs, common_ys, k,
+            executor, workers, tile_size)
+
+    # Keep candidates by rank, then drop the ones beyond the radius except the
+    # first candidate of a zone that would otherwise stay unconnected
+    rank = np.arange(k)[None, :]
+    keep = (rank < connectors_needed[zone_positions][:, None]) & (candidate_positions < len(common_node_ids))
+    zone_index = np.broadcast_to(zone_positions[:, None], candidate_positions.shape)[keep]
+    nearest_common_positions = candidate_positions[keep]
+    with stage("common connector lengths"):
+        common_pair_lengths = _compute_lengths(
+            common_xs[nearest_common_positions], common_ys[nearest_common_positions],
+            taz_xs[zone_index], taz_ys[zone_index], length_method, executor, workers)
+    if connector_radius is not None:
+        required = (np.broadcast_to(rank, candidate_positions.shape)[keep] == 0) & \
+                   (activity_connector_count[zone_index] == 0)
+        within_radius = required | (common_pair_lengths <= connector_radius)
+        zone_index = zone_index[within_radius]
+        nearest_common_positions = nearest_common_positions[within_radius]
+        common_pair_lengths = common_pair_lengths[within_radius]
+
+    # Step 2: Pair zones with activity nodes (zone -> activity node first) and
+    # with common nodes (common node -> zone first)
+    zone_index = np.concatenate([nearest_taz_positions, zone_index]).astype(np.intp)
+    connector_pairs = {
+        'zone_id': taz_node_ids[zone_index],
+        'zone_x': taz_node_xs[zone_index],
+        'zone_y': taz_node_ys[zone_index],
+        'node_id': np.concatenate([activity_node_ids, common_node_ids[nearest_common_positions]]),
+        'node_x': np.concatenate([activity_node_xs, common_node_xs[nearest_common_positions]]),
+        'node_y': np.concatenate([activity_node_ys, common_node_ys[nearest_common_positions]]),
+        'length': np.concatenate([np.round(activity_pair_lengths, 2), common_pair_lengths]),
+        'zone_first': np.arange(len(zone_index)) < len(nearest_taz_positions),
+    }
+    return connector_pairs, ave_pair_length
+
+
+def _select_snapped_pairs(activity_node_ids, activity_node_xs, activity_node_ys, activity_pair_lengths,
+                          nearest_taz_positions, taz_node_ids, taz_node_xs, taz_node_ys, taz_xs, taz_ys,
+                          zone_positions, link_snap, length_method, epsg, executor, workers):
+    """Pairs activity nodes as in _select_connector_pairs and the remaining zones with their snapped link points."""
+    print(f"Snapping {len(zone_positions)} zones without activity nodes to their nearest links...")
+    node_ids, node_xs, node_ys, split_links, split_fractions = _snap_points_to_links(
+        taz_node_xs[zone_positions], taz_node_ys[zone_positions], link_snap)
+    snap_xs, snap_ys = node_xs, node_ys
+    if epsg is not None:
+        (snap_xs, snap_ys), = project_to_local_utm((node_xs, node_ys), epsg=epsg)[0]
+    snap_lengths = _compute_lengths(snap_xs, snap_ys, taz_xs[zone_positions], taz_ys[zone_positions],
+                                    length_method, executor, workers)
+
+    zone_index = np.concatenate([nearest_taz_positions, zone_positions]).astype(np.intp)
+    return {
+        'zone_id': taz_node_ids[zone_index],
+        'zone_x': taz_node_xs[zone_index],
+        'zone_y': taz_node_ys[zone_index],
+        'node_id': np.concatenate([activity_node_ids, node_ids]),
+        'node_x': np.concatenate([activity_node_xs, node_xs]),
+        'node_y': np.concatenate([activity_node_ys, node_ys]),
+        'length': np.concatenate([np.round(activity_pair_lengths, 2), snap_lengths]),
+        'zone_first': np.arange(len(zone_index)) < len(nearest_taz_positions),
+        'split_link': np.concatenate([np.full(len(nearest_taz_positions), -1), split_links]),
+        'split_fraction': np.concatenate([np.full(len(nearest_taz_positions), np.nan), split_fractions]),
+    }
+
+
+def generate_connector_links(activity_node_df, common_node_df, node_taz_df, output_path=None,
+                             length_method="vincenty", connectors_per_zone=1, connector_radius=None,
+                             zone_boundary_df=None, workers=None, tile_size=None, link_snap=None,
+                             connected_activity_nodes=None, output_format="csv", csv_engine="pandas"):
     """
     Generates bi-directional connector links between activity nodes and their nearest TAZ nodes,
     adding geometry and length columns.
 
+    Every zone is then topped up to connectors_per_zone connectors with its nearest common
+    nodes lying within connector_radius. A zone without any connector always gets one to its
+    nearest common node, whatever the radius. The defaults reproduce the single-connector rule.
+
+    When zone_boundary_df is given, each activity node is attached to the zone polygon that
+    contains it, and only nodes outside every polygon fall back to the nearest centroid.
+
     Args:
         activity_node_df (pd.DataFrame): DataFrame containing activity nodes with 'new_node_id', 'x_coord', and 'y_coord'.
+        common_node_df (pd.DataFrame): Candidate nodes for zones that need more connectors, with 'new_node_id', 'x_coord', and 'y_coord'.
         node_taz_df (pd.DataFrame): DataFrame containing TAZ nodes with 'node_id', 'x_coord', and 'y_coord'.
-        output_file (str, optional): Path to save the connector_links_df as a CSV file. Default is None.
+        output_path (str, optional): Folder to save connector_links.csv in. Default is None, which skips saving.
+        length_method (str): Connector length computation, one of 'vincenty', 'haversine' or 'geodesic'
+                             (see compute_link_lengths), or 'projected' to search and measure in
+                             meters on the local UTM zone (see project_to_local_utm). Default is 'vincenty'.
+        connectors_per_zone (int): Target number of connectors per zone. Default is 1.
+        connector_radius (float, optional): Maximum length in meters of the top-up connectors. Default is None (no limit).
+        zone_boundary_df (pd.DataFrame, optional): Zone polygons with 'zone_id' and 'geometry' (zone_boundary.csv).
+        workers (int, optional): Number of processes for tiled nearest-neighbour search and lengths. Default is None (one process).
+        tile_size (float, optional): Tile side for workers > 1, in degrees (meters when projected). Default is None (about four tiles per worker).
+        link_snap (dict, optional): Links to snap zones without activity nodes to (see prepare_link_snapping).
+                                    The links are split afterwards by split_links_at_connectors. Default is None.
+        connected_activity_nodes (np.ndarray, optional): Mask of the activity nodes that count as connecting
+                                                         their zone (see select_connected_activity_nodes).
+                                                         Default is None (all).
+        output_format (str): File format of connector_links, one of GMNS_TABLE_FORMATS. Default is 'csv'.
+        csv_engine (str): CSV writer, one of CSV_ENGINES (see write_gmns_csv). Default is 'pandas'.
 
     Returns:
         pd.DataFrame: A DataFrame containing bi-directional connector links with columns:
@@ -118,251 +1117,246 @@ def generate_connector_links(activity_node_df, common_node_df, node_taz_df, outp
     try:
         print("Starting to generate connector links...")
 
-        # Create an empty list to store the connector links
-        connector_links = []
-
-        # Step 1: Calculate the nearest TAZ node for each activity node
-        print("Calculating nearest TAZ nodes for activity nodes...")
-        total_length = 0
-        pair_number = 0
-        for idx, activity_node in activity_node_df.iterrows():
-            # Extract activity node details
-            activity_node_id = activity_node['new_node_id']
-            activity_node_x = activity_node['x_coord']
-            activity_node_y = activity_node['y_coord']
-
-            # Calculate the Euclidean distance to all TAZ nodes
-            node_taz_df['distance'] = np.sqrt(
-                (node_taz_df['x_coord'] - activity_node_x) ** 2 + 
-                (node_taz_df['y_coord'] - activity_node_y) ** 2
-            )
-
-            # Find the nearest TAZ node
-            nearest_taz_node = node_taz_df.loc[node_taz_df['distance'].idxmin()]
-            nearest_taz_node_id = nearest_taz_node['node_id']
-            nearest_taz_node_x = nearest_taz_node['x_coord']
-            nearest_taz_node_y = nearest_taz_node['y_coord']
-            # Step 2: Create bi-directional connector links with geometry and length
-            for from_id, to_id, from_x, from_y, to_x, to_y in [
-                (nearest_taz_node_id, activity_node_id, nearest_taz_node_x, nearest_taz_node_y, activity_node_x, activity_node_y),
-                (activity_node_id, nearest_taz_node_id, activity_node_x, activity_node_y, nearest_taz_node_x, nearest_taz_node_y)
-            ]:
-                # Calculate geometry as a LINESTRING
-                geometry = f"LINESTRING ({from_x} {from_y}, {to_x} {to_y})"
-
-                # Calculate length in meters using geopy, if you wanna use actual distance, pls uncomment the following command
-                #length = geodesic((from_y, from_x), (to_y, to_x)).meters
-                total_length = total_length+geodesic((from_y, from_x), (to_y, to_x)).meters
-                pair_number = pair_number+1
-                #length=100
-                #length = geodesic((from_y, from_x), (to_y, to_x)).meters
-                length = round(geodesic((from_y, from_x), (to_y, to_x)).meters, 2)
-
-                
-                # Append link information to the list
-                connector_links.append({
-                    "link_id": len(connector_links) + 1,
-                    "from_node_id": from_id,
-                    "to_node_id": to_id,
-                    "dir_flag": 1,
-                    "length": length,
-                    "lanes": 1,
-                    "free_speed": 90,
-                    "capacity": 99999,
-                    "link_type_name": "connector",
-                    "link_type": 0,
-                    "geometry": geometry,
-                    "allowed_uses": "auto",
-                    "from_biway": 1,
-                    "is_link": 0                    
-                })
-            
-        print("Calculating nearest activity nodes for taz nodes...")       
-        ave_pair_length = total_length/pair_number
-        print(f"ave pair length: '{ave_pair_length}' meters.")
-        for idx, taz_node in node_taz_df.iterrows():
-            # Extract taz node details
-            taz_node_id = taz_node['node_id']
-            taz_node_x = taz_node['x_coord']
-            taz_node_y = taz_node['y_coord']
-            if any(taz_node['node_id'] == l['from_node_id'] for l in connector_links):
-                continue
-                    
-
-            # Calculate the Euclidean distance to all taz nodes
-            common_node_df['distance'] = np.sqrt(
-                (common_node_df['x_coord'] - taz_node_x) ** 2 + 
-                (common_node_df['y_coord'] - taz_node_y) ** 2
-            )
-
-            # Find the nearest ACT node
-            nearest_common_node = common_node_df.loc[common_node_df['distance'].idxmin()]
-            nearest_common_node_id = nearest_common_node['new_node_id']
-            nearest_common_node_x = nearest_common_node['x_coord']
-            nearest_common_node_y = nearest_common_node['y_coord']
-
-            # Step 2: Create bi-directional connector links with geometry and length
-            for from_id, to_id, from_x, from_y, to_x, to_y in [
-                (nearest_common_node_id, taz_node_id, nearest_common_node_x, nearest_common_node_y, taz_node_x, taz_node_y),
-                (taz_node_id, nearest_common_node_id, taz_node_x, taz_node_y, nearest_common_node_x, nearest_common_node_y)
-            ]:
-                # Calculate geometry as a LINESTRING
-                geometry = f"LINESTRING ({from_x} {from_y}, {to_x} {to_y})"
-
-                # Calculate length in meters using geopy, if you wanna use actual distance, pls uncomment the following command
-                #length = 100
-                length = geodesic((from_y, from_x), (to_y, to_x)).meters
-                
-                #if geodesic((from_y, from_x), (to_y, to_x)).meters < 1000000000000:
-                    # Append link information to the list
-                connector_links.append({
-                    "link_id": len(connector_links) + 1,
-                    "from_node_id": from_id,
-                    "to_node_id": to_id,
-                    "dir_flag": 1,
-                    "length": length,
-                    "lanes": 1,
-                    "free_speed": 90,
-                    "capacity": 99999,
-                    "link_type_name": "connector",
-                    "link_type": 0,
-                    "geometry": geometry,
-                    "allowed_uses": "auto",
-                    "from_biway": 1,
-                    "is_link": 0                    
-                })
-     
-        # Step 3: Convert the list of links to a DataFrame
-        connector_links_df = pd.DataFrame(connector_links)
+        connector_pairs, ave_pair_length = select_connector_pairs(
+            activity_node_df, common_node_df, node_taz_df, length_method=length_method,
+            connectors_per_zone=connectors_per_zone, connector_radius=connector_radius,
+            zone_boundary_df=zone_boundary_df, workers=workers, tile_size=tile_size, link_snap=link_snap,
+            connected_activity_nodes=connected_activity_nodes)
+
+        # Step 3: Assemble the connector columns into a DataFrame
+        with stage("build connector table"):
+            connector_links_df = _create_connector_links_df(connector_pairs)
         print(f"Generated {len(connector_links_df)} connector links.")
-        
-        # Step3.5 Add new columns
-        connector_links_df["vdf_toll"] = 0
-        connector_links_df["allowed_uses"] = None
-        connector_links_df["vdf_alpha"] = 0.15
-        connector_links_df["vdf_beta"] = 4
-        connector_links_df["vdf_plf"] = 1
-        connector_links_df["vdf_length_mi"] = (connector_links_df["length"] / 1609).round(2)
-        connector_links_df["vdf_free_speed_mph"] = (((connector_links_df["free_speed"] / 1.60934) / 5).round() * 5)
-        connector_links_df["free_speed_in_mph_raw"] = round(connector_links_df["vdf_free_speed_mph"] / 5) * 5
-        connector_links_df["vdf_fftt"] = ((connector_links_df["length"] / connector_links_df["free_speed"]) * 0.06).round(2)
-
-
-
-        other_columns = ['ref_volume',	'base_volume',	'base_vol_auto',	'restricted_turn_nodes']
-        for other_column in other_columns:
-            connector_links_df[other_column] = None
-
-        # Step 4: Save to a CSV file if an output file is provided
-        file_name = "connector_links.csv"
-        output_file = os.path.join(output_path, file_name)
-        if output_file:
-            connector_links_df.to_csv(output_file, index=False)
+
+        # Step 4: Save to a CSV file if an output path is provided
+        if output_path is not None:
+            output_file = save_network_table(connector_links_df, output_path, "connector_links", output_format,
+                                             csv_engine, transform=materialize_link_geometry)
             print(f"The connector links have been successfully saved to '{output_file}'.")
         else:
-            print("Output file not provided. Skipping file saving.")
+            print("Output path not provided. Skipping file saving.")
 
         return connector_links_df, ave_pair_length
 
     except Exception as e:
         print(f"An error occurred while generating connector links: {e}")
+        raise
+
+
+def forward_star_order(from_node_ids, to_node_ids):
+    """
+    Returns the stable permutation that puts links in forward-star order, sorted by
+    from_node_id and then to_node_id.
+
+    Only the two id arrays are sorted (as int32 when the ids fit), so a wide link table
+    is permuted once with take instead of being sorted column by column.
+
+    Args:
+        from_node_ids, to_node_ids (array-like): Link end node ids.
+
+    Returns:
+        np.ndarray: Row positions in forward-star order; links with equal ends keep their order.
+    """
+    keys = []
+    for node_ids in (to_node_ids, from_node_ids):
+        node_ids = np.asarray(node_ids)
+        int32 = np.iinfo(np.int32)
+        if node_ids.dtype.kind in 'iu' and len(node_ids) and int32.min <= node_ids.min() and node_ids.max() <= int32.max:
+            node_ids = node_ids.astype(np.int32)
+        keys.append(node_ids)
+    return np.lexsort(keys)
+
+
+# Folder and array names of the binary forward-star index written next to link_updated.csv
+FORWARD_STAR_DIR = "forward_star"
+FORWARD_STAR_ARRAYS = ("first_link", "last_link", "to_node", "link_id")
+
+
+def save_forward_star_index(link_updated_df, node_updated_df, output_path):
+    """
+    Saves the forward-star adjacency of link_updated as .npy arrays in output_path/forward_star.
 
+    The outgoing links of node n are rows first_link[n]:last_link[n] of link_updated, whose
+    end nodes and ids are to_node[first_link[n]:last_link[n]] and link_id[...]. first_link
+    and last_link are indexed by node_id, so unused ids get empty ranges.
+
+    Args:
+        link_updated_df (pd.DataFrame): Links in forward-star order (see forward_star_order).
+        node_updated_df (pd.DataFrame): Nodes with 'node_id'.
+        output_path (str): Folder holding the step 3 outputs.
+    """
+    if link_updated_df[['from_node_id', 'to_node_id']].isnull().any().any():
+        print("Warning: Some links have unmapped node ids; skipping the forward-star index.")
+        return
+    from_node_ids = link_updated_df['from_node_id'].to_numpy(dtype=np.int64)
+    node_count = int(max(node_updated_df['node_id'].max(), from_node_ids.max(initial=0),
+                         link_updated_df['to_node_id'].max())) + 1
+    node_ids = np.arange(node_count)
+    arrays = {
+        'first_link': np.searchsorted(from_node_ids, node_ids, side='left'),
+        'last_link': np.searchsorted(from_node_ids, node_ids, side='right'),
+        'to_node': link_updated_df['to_node_id'].to_numpy(dtype=np.int64),
+        'link_id': link_updated_df['link_id'].to_numpy(dtype=np.int64),
+    }
+    index_path = os.path.join(output_path, FORWARD_STAR_DIR)
+    os.makedirs(index_path, exist_ok=True)
+    for name in FORWARD_STAR_ARRAYS:
+        np.save(os.path.join(index_path, f"{name}.npy"), arrays[name])
+    print(f"The forward-star index has been saved to '{index_path}'.")
+
+
+def load_forward_star_index(output_path, mmap_mode="r"):
+    """
+    Loads the forward-star index written by save_forward_star_index.
+
+    Args:
+        output_path (str): Folder holding the step 3 outputs.
+        mmap_mode (str, optional): Passed to np.load. The default 'r' maps the arrays
+                                   read-only without reading them into memory.
+
+    Returns:
+        dict: 'first_link', 'last_link', 'to_node' and 'link_id' arrays.
+    """
+    index_path = os.path.join(output_path, FORWARD_STAR_DIR)
+    return {name: np.load(os.path.join(index_path, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in FORWARD_STAR_ARRAYS}
 
-# Example usage
-connector_links_df, ave_pair_length = generate_connector_links(activity_node_df, common_node_df, node_taz_df, output_path)
 
+def _nullable_integer_columns(df, other_columns):
+    """Returns df with its integer columns missing from other_columns cast to the nullable Int dtype of the same size."""
+    columns = {column: f"{'U' if df[column].dtype.kind == 'u' else ''}Int{df[column].dtype.itemsize * 8}"
+               for column in df.columns
+               if column not in other_columns and df[column].dtype.kind in 'iu' and isinstance(df[column].dtype, np.dtype)}
+    return df.astype(columns) if columns else df
 
-# Display the connector links DataFrame
-#print("Connector Links DataFrame:")
-#print(connector_links_df.head())
 
 #%%
-def update_and_merge_links(link_df, updated_node_df, connector_links_df, output_path):
+def update_and_merge_links(link_df, updated_node_df, connector_links_df, output_path=None, output_format="csv",
+                           csv_engine="pandas"):
     """
     Updates link_df with new_node_id, merges it with connector_links_df, and saves the updated file.
 
+    The combined table is assembled one column at a time in forward-star order, so apart from
+    the result only about one column is copied at a time.
+
     Args:
-        link_df (pd.DataFrame): DataFrame containing the original link data.
-        node_df (pd.DataFrame): DataFrame containing node_id and new_node_id mapping.
-        connector_links_df (pd.DataFrame): DataFrame containing the connector links.
-        output_file (str): Path to save the updated Link_Updated.csv file.
+        link_df (pd.DataFrame): DataFrame containing the original link data. It is not modified.
+        updated_node_df (pd.DataFrame): DataFrame containing node_id and new_node_id mapping.
+        connector_links_df (pd.DataFrame): DataFrame containing the connector links. It is not modified.
+        output_path (str, optional): Folder to save link_updated.csv in. Default is None, which skips saving.
+        output_format (str): File format of link_updated, one of GMNS_TABLE_FORMATS. The CSV file
+                             is written for DTALite either way. Default is 'csv'.
+        csv_engine (str): CSV writer, one of CSV_ENGINES. The rows are streamed in forward-star
+                          order in chunks (see write_gmns_csv). Default is 'pandas'.
+
+    Returns:
+        pd.DataFrame: The combined link table sorted in forward-star order.
     """
     try:
-        # Step 1: Create a mapping of node_id to new_node_id
-        node_id_map = dict(zip(updated_node_df['node_id'], updated_node_df['new_node_id']))
+        # Step 1: Take the node_id to new_node_id mapping as arrays
+        old_node_ids = updated_node_df['node_id'].to_numpy()
+        new_node_ids = updated_node_df['new_node_id'].to_numpy()
 
-        # Step 2: Update from_node_id and to_node_id in link_df
-        link_df['from_node_id'] = link_df['from_node_id'].map(node_id_map)
-        link_df['to_node_id'] = link_df['to_node_id'].map(node_id_map)
+        # Step 2: Map from_node_id and to_node_id of link_df; link_df itself is left unchanged
+        from_node_ids = map_node_ids(link_df['from_node_id'].to_numpy(), old_node_ids, new_node_ids)
+        to_node_ids = map_node_ids(link_df['to_node_id'].to_numpy(), old_node_ids, new_node_ids)
 
         # Step 3: Validate if there are any unmatched IDs
-        if link_df['from_node_id'].isnull().any() or link_df['to_node_id'].isnull().any():
+        if pd.isna(from_node_ids).any() or pd.isna(to_node_ids).any():
             print("Warning: Some from_node_id or to_node_id in link_df could not be mapped to new_node_id.")
 
-        # Step 3.5: Add new column to link_df
-        # Step3.5 Add new columns
-        link_df["vdf_toll"] = 0
-        link_df["allowed_uses"] = None
-        link_df["vdf_alpha"] = 0.15
-        link_df["vdf_beta"] = 4
-        link_df["vdf_plf"] = 1
-        link_df["vdf_length_mi"] = (link_df["length"] / 1609).round(2)
-        link_df["vdf_free_speed_mph"] = (((link_df["free_speed"] / 1.60934) / 5).round() * 5)
-        link_df["free_speed_in_mph_raw"] = round(link_df["vdf_free_speed_mph"] / 5) * 5
-        link_df["vdf_fftt"] = ((link_df["length"] / link_df["free_speed"]) * 0.06).round(2)
-
-        other_columns = ['ref_volume',	'base_volume',	'base_vol_auto',	'restricted_turn_nodes']
-        for other_column in other_columns:
-            link_df[other_column] = None
-
-        # Step 4: Align columns between link_df and connector_links_df
-        all_columns = set(link_df.columns).union(connector_links_df.columns)
-
-        # Add missing columns with None
-        for col in all_columns:
-            if col not in link_df.columns:
-                link_df[col] = None
-            if col not in connector_links_df.columns:
-                connector_links_df[col] = None
-
-        # Ensure connector_links_df has the same column order as link_df
-        connector_links_df = connector_links_df[link_df.columns]
-        #breakpoint()
-
-        # Step 5: Combine link_df and connector_links_df
-        combined_links_df = pd.concat([link_df, connector_links_df], ignore_index=True)
-        
+        # Step 4: Align columns: link_df columns, the derived attributes, then connector-only columns,
+        # without the optional columns to remove
+        columns_to_remove = ["VDF_fftt", "VDF_toll_auto", "notes", "toll"]
+        columns = [column for column in
+                   list(link_df.columns)
+                   + [column for column in LINK_ATTRIBUTE_COLUMNS if column not in link_df.columns]
+                   + [column for column in connector_links_df.columns
+                      if column not in link_df.columns and column not in LINK_ATTRIBUTE_COLUMNS]
+                   if column not in columns_to_remove]
+
+        # Step 5: Put the combined end node ids in forward-star order
+        from_node_ids = np.concatenate([from_node_ids, connector_links_df['from_node_id'].to_numpy()])
+        to_node_ids = np.concatenate([to_node_ids, connector_links_df['to_node_id'].to_numpy()])
+        order = forward_star_order(from_node_ids, to_node_ids)
+
+        # Step 6: Combine link_df and connector_links_df one column at a time, already in forward-star
+        # order, so no combined copy of the whole table is made besides the result. Integer columns
+        # of only one side (e.g. directed, is_link) become nullable, so the rows of the other side are
+        # left empty instead of turning the column into float
+        link_part = pd.DataFrame(index=pd.RangeIndex(len(link_df)))
+        connector_part = pd.DataFrame(index=pd.RangeIndex(len(connector_links_df)))
+        combined_columns = {}
+        for column in columns:
+            if column in LINK_ATTRIBUTE_COLUMNS or column == 'link_id':
+                continue
+            if column == 'from_node_id':
+                combined_columns[column] = from_node_ids[order]
+                continue
+            if column == 'to_node_id':
+                combined_columns[column] = to_node_ids[order]
+                continue
+            parts = [_nullable_integer_columns(df[[column]], other_df.columns) if column in df.columns else part
+                     for df, other_df, part in ((link_df, connector_links_df, link_part),
+                                                (connector_links_df, link_df, connector_part))]
+            combined_columns[column] = pd.concat(parts, ignore_index=True)[column].take(order).reset_index(drop=True)
+        combined_links_df = pd.DataFrame(combined_columns, copy=False)
 
-        # Step 6: Sort and assign new link_id
-        combined_links_df = combined_links_df.sort_values(by=['from_node_id', 'to_node_id']).reset_index(drop=True)
-        combined_links_df['link_id'] = range(1, len(combined_links_df) + 1)
-        
-        # #Step 6.1: Optional. List of columns to remove if they exist
-        columns_to_remove = ["VDF_fftt", "VDF_toll_auto","notes","toll"]
-        # Drop only the columns that exist
-        combined_links_df.drop(columns=[col for col in columns_to_remove if col in combined_links_df.columns], inplace=True)
+        # Step 7: Assign new link_id and derive the VDF attributes of both sides in one pass
+        combined_links_df['link_id'] = np.arange(1, len(combined_links_df) + 1)
+        combined_links_df = derive_link_attributes(combined_links_df)[columns]
 
-        # Step 7: Save the updated DataFrame to the output file
-        file_name = "link_updated.csv"
-        output_file = os.path.join(output_path, file_name)
-        combined_links_df.to_csv(output_file, index=False)
-        print(f"Updated and merged data has been saved to {output_file}.")
+        # Step 8: Save the updated DataFrame to the output file
+        if output_path is not None:
+            output_file = save_network_table(combined_links_df, output_path, "link_updated", output_format,
+                                             csv_engine, transform=materialize_link_geometry)
+            print(f"Updated and merged data has been saved to {output_file}.")
+
+        return combined_links_df
 
     except Exception as e:
         print(f"An error occurred: {e}")
-
-# Example usage
-update_and_merge_links(link_df, updated_node_df, connector_links_df, output_path)
+        raise
 
 # %%
-def create_updated_node_df(updated_node_df, node_taz_df, output_path):
+def fill_missing_point_geometry(node_df):
+    """
+    Fills empty or NaN 'geometry' values with a WKT POINT built from x_coord/y_coord.
+
+    Args:
+        node_df (pd.DataFrame): Node table with 'x_coord', 'y_coord' and optionally 'geometry'.
+
+    Returns:
+        pd.DataFrame: node_df with a complete 'geometry' column.
+    """
+    if 'geometry' not in node_df.columns:
+        node_df['geometry'] = None
+
+    geometry = node_df['geometry']
+    missing = geometry.isna() | (geometry.fillna('').astype(str).str.strip() == '')
+    if missing.any():
+        node_df['geometry'] = geometry.astype(object)
+        node_df.loc[missing, 'geometry'] = (
+            "POINT (" + node_df.loc[missing, 'x_coord'].astype(str) + " "
+            + node_df.loc[missing, 'y_coord'].astype(str) + ")")
+    return node_df
+
+
+def create_updated_node_df(updated_node_df, node_taz_df, output_path=None, output_format="csv",
+                           csv_engine="pandas"):
     """
     Creates a new Node_Updated_df by combining node_taz_df and node_df with updates.
 
     Args:
-        node_df (pd.DataFrame): DataFrame containing the original node data with new_node_id.
+        updated_node_df (pd.DataFrame): DataFrame containing the original node data with new_node_id.
         node_taz_df (pd.DataFrame): DataFrame containing TAZ nodes.
-        output_file (str): Path to save the Node_Updated.csv file.
+        output_path (str, optional): Folder to save node_updated.csv in. Default is None, which skips saving.
+        output_format (str): File format of node_updated, one of GMNS_TABLE_FORMATS. The CSV file
+                             is written for DTALite either way. Default is 'csv'.
+        csv_engine (str): CSV writer, one of CSV_ENGINES (see write_gmns_csv). Default is 'pandas'.
+
+    Returns:
+        pd.DataFrame: The combined node table sorted by node_id.
     """
     try:
         # Step 1: Rename 'node_id' in updated_node_df to 'old_node_id' and use 'new_node_id' as the current ID
@@ -380,31 +1374,429 @@ def create_updated_node_df(updated_node_df, node_taz_df, output_path):
         Node_Updated_df = Node_Updated_df.sort_values(by=['node_id']).reset_index(drop=True)
         
         # Step 5: Remove the 'ctrl_type' and 'distance' columns
-        Node_Updated_df = Node_Updated_df.drop(columns=['ctrl_type', 'distance'])
+        Node_Updated_df = Node_Updated_df.drop(columns=['ctrl_type', 'distance'], errors='ignore')
         
         # Step 5.5: Check the geometry element and fill it if it is empty
         # Replace empty or NaN values in the 'geometry' column with POINT(x_coord y_coord)
-        for i in range(len(Node_Updated_df)):            
-            if pd.isna(Node_Updated_df.loc[i, 'geometry']) or Node_Updated_df.loc[i, 'geometry'].strip() == '':  # Check for empty or NaN-like values
-                x_coord = Node_Updated_df.loc[i, 'x_coord']
-                y_coord = Node_Updated_df.loc[i, 'y_coord']
-                Node_Updated_df.loc[i, 'geometry'] = f"POINT ({x_coord} {y_coord})"
+        Node_Updated_df = fill_missing_point_geometry(Node_Updated_df)
 
         # Step 6: Save node_updated_df to a CSV file
-        file_name = "node_updated.csv"
-        output_file = os.path.join(output_path, file_name)
-        Node_Updated_df.to_csv(output_file, index=False)
-        print(f"The updated node data has been successfully saved to '{output_file}'.")
+        if output_path is not None:
+            output_file = save_network_table(Node_Updated_df, output_path, "node_updated", output_format, csv_engine)
+            print(f"The updated node data has been successfully saved to '{output_file}'.")
+
+        return Node_Updated_df
 
     except Exception as e:
         print(f"An error occurred: {e}")
-        
-# Example usage
-create_updated_node_df(updated_node_df, node_taz_df, output_path)
+        raise
 
-# End timing
-end_time = time.time()
 
-# Print the computational time
-print(f"Computational time: {end_time - start_time:.2f} seconds")
 
+# %%
+def build_connected_network(node_df, link_df, zone_df, output_path=None, length_method="vincenty",
+                            connectors_per_zone=1, connector_radius=None, connector_link_types=None,
+                            zone_boundary_df=None, workers=None, tile_size=None, largest_scc_only=False,
+                            snap_to_links=False, dense_node_ids=False, output_format="csv", csv_engine="pandas"):
+    """
+    Builds the connected network in memory from the physical network and zone centroids.
+
+    The input DataFrames are not modified, so the same inputs can be reused to build
+    many scenario networks in one process.
+
+    Args:
+        node_df (pd.DataFrame): Physical network nodes (node.csv).
+        link_df (pd.DataFrame): Physical network links (link.csv).
+        zone_df (pd.DataFrame): Zone centroid nodes (zone_centroid.csv).
+        output_path (str, optional): Folder to write the step 3 CSV files to. Default is None,
+                                     which keeps everything in memory.
+        length_method (str): Connector length computation passed to generate_connector_links.
+        connectors_per_zone (int): Target number of connectors per zone (see generate_connector_links).
+        connector_radius (float, optional): Maximum length in meters of top-up connectors.
+        connector_link_types (iterable of str, optional): Only nodes on links of these types may
+                                                          receive top-up connectors. Default is None (all nodes).
+        zone_boundary_df (pd.DataFrame, optional): Zone polygons (zone_boundary.csv) used to assign
+                                                   activity nodes by containment instead of distance.
+        workers (int, optional): Processes for tiled connector generation (see generate_connector_links).
+        tile_size (float, optional): Tile side in coordinate units for workers > 1.
+        largest_scc_only (bool): Only nodes in the largest strongly connected component of the
+                                 physical links may receive top-up connectors, and zones whose
+                                 activity nodes all lie outside it get one. Default is False.
+        snap_to_links (bool): Connect zones without activity nodes to a new node on their nearest
+                              eligible link, splitting it, instead of to the nearest common node.
+                              Requires connectors_per_zone == 1. Default is False.
+        dense_node_ids (bool): Renumber the nodes consecutively after the zones (see
+                               process_and_save_activity_node_data). The mapping is saved to
+                               node_id_mapping.csv either way. Default is False.
+        output_format (str): File format of the step 3 tables, one of GMNS_TABLE_FORMATS. Parquet
+                             and Feather load faster in step 4; link_updated and node_updated are
+                             also written as CSV for DTALite. Default is 'csv'.
+        csv_engine (str): CSV writer, 'pandas' or the multithreaded 'pyarrow' (see write_gmns_csv).
+                          Default is 'pandas'.
+
+    Returns:
+        dict: DataFrames keyed by output name: 'activity_node', 'common_node', 'connector_links',
+              'link_updated' and 'node_updated'. Connector geometry is kept as coordinate
+              columns; pass link tables through materialize_link_geometry before exporting them.
+    """
+    if output_path is not None:
+        os.makedirs(output_path, exist_ok=True)
+
+    with stage("split activity and common nodes"):
+        updated_node_df, activity_node_df, common_node_df = process_and_save_activity_node_data(
+            node_df, zone_df, output_path, dense_node_ids, output_format, csv_engine)
+    with stage("select candidate nodes"):
+        candidate_node_df = select_candidate_nodes(common_node_df, link_df, connector_link_types, largest_scc_only)
+        connected_activity_nodes = (select_connected_activity_nodes(activity_node_df, link_df)
+                                    if largest_scc_only else None)
+    link_snap = None
+    if snap_to_links:
+        with stage("prepare link snapping"):
+            link_snap = prepare_link_snapping(link_df, updated_node_df, connector_link_types, largest_scc_only)
+    with stage("generate connectors"):
+        connector_links_df, ave_pair_length = generate_connector_links(
+            activity_node_df, candidate_node_df, zone_df, output_path, length_method=length_method,
+            connectors_per_zone=connectors_per_zone, connector_radius=connector_radius,
+            zone_boundary_df=zone_boundary_df, workers=workers, tile_size=tile_size, link_snap=link_snap,
+            connected_activity_nodes=connected_activity_nodes, output_format=output_format, csv_engine=csv_engine)
+    with stage("split links at connectors"):
+        link_df, updated_node_df = split_links_at_connectors(link_df, updated_node_df, connector_links_df)
+    if output_path is not None:
+        save_node_id_mapping(updated_node_df, output_path, output_format, csv_engine)
+    with stage("merge and sort links"):
+        link_updated_df = update_and_merge_links(link_df, updated_node_df, connector_links_df, output_path,
+                                                 output_format, csv_engine)
+    with stage("update nodes"):
+        node_updated_df = create_updated_node_df(updated_node_df, zone_df, output_path, output_format, csv_engine)
+    if output_path is not None:
+        with stage("forward-star index"):
+            save_forward_star_index(link_updated_df, node_updated_df, output_path)
+
+    return {
+        'activity_node': activity_node_df,
+        'common_node': common_node_df,
+        'connector_links': connector_links_df,
+        'link_updated': link_updated_df,
+        'node_updated': node_updated_df,
+    }
+
+
+# %%
+# Row hashes and build options of the last run, kept next to the outputs for incremental rebuilds
+BUILD_STATE_FILE = "build_state.npz"
+
+# Stage timings of the last command line run (see Stage_Timing.StageTimer)
+TIMINGS_FILE = "timings.json"
+
+
+def _row_hashes(df):
+    """Hashes the values of every row of df into a uint64 array."""
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def _table_digest(df):
+    """Hashes a whole table into one hex digest."""
+    return hashlib.sha1(_row_hashes(df).tobytes()).hexdigest()
+
+
+def _splice_sorted_rows(sorted_df, key_columns, new_df):
+    """
+    Inserts new_df into sorted_df, which is sorted on key_columns, keeping the order.
+
+    Only the new rows are sorted; each is placed after the existing rows with an equal
+    key, so the existing rows are never reordered.
+    """
+    def composite_keys(df):
+        keys = np.zeros(len(df), dtype=np.int64)
+        for column in key_columns:
+            keys = keys * key_base + df[column].to_numpy(dtype=np.int64)
+        return keys
+
+    key_base = 1 + int(max([sorted_df[column].max() for column in key_columns if len(sorted_df)]
+                           + [new_df[column].max() for column in key_columns if len(new_df)] + [0]))
+    new_df = new_df.iloc[np.argsort(composite_keys(new_df), kind="stable")]
+    insert_at = np.searchsorted(composite_keys(sorted_df), composite_keys(new_df), side="right")
+
+    # Row i of the spliced table comes from new_df where it is marked in from_new
+    from_new = np.zeros(len(sorted_df) + len(new_df), dtype=bool)
+    from_new[insert_at + np.arange(len(new_df))] = True
+    order = np.empty(len(from_new), dtype=np.intp)
+    order[~from_new] = np.arange(len(sorted_df))
+    order[from_new] = len(sorted_df) + np.arange(len(new_df))
+
+    combined_df = pd.concat([sorted_df, new_df], ignore_index=True)
+    columns = list(sorted_df.columns) + [column for column in new_df.columns if column not in sorted_df.columns]
+    return combined_df[columns].take(order).reset_index(drop=True)
+
+
+def _load_previous_network(output_path, output_format="csv"):
+    """
+    Reads the step 3 outputs of a previous run with the GMNS column types. Float columns
+    are loaded as float64 in every format, so their values are written back unchanged.
+    """
+    network = {}
+    for name in ('connector_links', 'link_updated', 'node_updated'):
+        file_path = os.path.join(output_path, f"{name}.{output_format}")
+        network[name] = read_gmns_table(file_path)
+    return network
+
+
+def _cast_like(df, dtypes):
+    """Casts the columns of df to the dtype of the same column in dtypes, as produced by a full build."""
+    columns = {}
+    for column in df.columns:
+        if column in dtypes and df[column].dtype != dtypes[column]:
+            # Categories are rebuilt from the values rather than taken from the other table
+            columns[column] = "category" if isinstance(dtypes[column], pd.CategoricalDtype) else dtypes[column]
+    return df.astype(columns) if columns else df
+
+
+def build_connected_network_incremental(node_df, link_df, zone_df, output_path, previous_network=None,
+                                        **build_options):
+    """
+    Rebuilds the connected network in output_path, regenerating only the connectors of
+    zones affected by edits to zone or node rows since the last run.
+
+    Row hashes of zone_df and node_df are stored in build_state.npz. Changed rows are
+    detected by hash. Connector selection is re-run in memory, which is cheap with the
+    spatial index. Only the connectors of zones whose selection or end points changed are
+    rebuilt. They are spliced into the existing forward-star-sorted link_updated table
+    without re-sorting it, and the changed node rows are spliced into node_updated. A full
+    build runs instead when there is no previous state, or when the link table, the build
+    options, or the set of zone or node ids changed, and always when snapping to links,
+    which edits the link table.
+
+    Args:
+        node_df, link_df, zone_df (pd.DataFrame): Inputs as for build_connected_network.
+        output_path (str): Folder holding the previous outputs and build state.
+        previous_network (dict, optional): Tables returned by the previous run. Default is None,
+                                           which reads them back from output_path.
+        **build_options: Options passed to build_connected_network.
+
+    Returns:
+        dict: DataFrames keyed by output name, with the column types of build_connected_network.
+              The 'activity_node' and 'common_node' entries are only present when node rows were re-split.
+    """
+    os.makedirs(output_path, exist_ok=True)
+    state_file = os.path.join(output_path, BUILD_STATE_FILE)
+
+    zone_boundary_df = build_options.get('zone_boundary_df')
+    options_key = json.dumps({
+        **{name: value for name, value in build_options.items()
+           if name not in ('zone_boundary_df', 'workers', 'tile_size', 'csv_engine')},
+        'zone_boundary': None if zone_boundary_df is None else _table_digest(zone_boundary_df),
+    }, sort_keys=True, default=list)
+    state = {
+        'options_key': np.array(options_key),
+        'link_digest': np.array(_table_digest(link_df)),
+        'zone_ids': zone_df['node_id'].to_numpy(),
+        'zone_hashes': _row_hashes(zone_df),
+        'node_ids': node_df['node_id'].to_numpy(),
+        'node_hashes': _row_hashes(node_df),
+    }
+
+    previous_state = None
+    if os.path.exists(state_file):
+        with np.load(state_file) as saved:
+            previous_state = {name: saved[name] for name in saved.files}
+
+    if (previous_state is None
+            or build_options.get('snap_to_links')
+            or str(previous_state['options_key']) != options_key
+            or str(previous_state['link_digest']) != str(state['link_digest'])
+            or not np.array_equal(previous_state['zone_ids'], state['zone_ids'])
+            or not np.array_equal(previous_state['node_ids'], state['node_ids'])):
+        print("No reusable build state; running a full build...")
+        network = build_connected_network(node_df, link_df, zone_df, output_path, **build_options)
+        np.savez(state_file, **state)
+        return network
+
+    changed_zones = previous_state['zone_hashes'] != state['zone_hashes']
+    changed_nodes = previous_state['node_hashes'] != state['node_hashes']
+    print(f"{changed_zones.sum()} zone rows and {changed_nodes.sum()} node rows changed since the last build.")
+    output_format = build_options.get('output_format', "csv")
+    csv_engine = build_options.get('csv_engine', "pandas")
+    if previous_network is None:
+        with stage("load previous network"):
+            previous_network = _load_previous_network(output_path, output_format)
+    if not changed_zones.any() and not changed_nodes.any():
+        return previous_network
+
+    # Step 1: Re-split activity and common nodes, saving them only if node rows changed
+    updated_node_df, activity_node_df, common_node_df = process_and_save_activity_node_data(
+        node_df, zone_df, output_path if changed_nodes.any() else None, build_options.get('dense_node_ids', False),
+        output_format, csv_engine)
+    candidate_node_df = select_candidate_nodes(common_node_df, link_df, build_options.get('connector_link_types'),
+                                               build_options.get('largest_scc_only', False))
+    connected_activity_nodes = (select_connected_activity_nodes(activity_node_df, link_df)
+                                if build_options.get('largest_scc_only') else None)
+
+    # Step 2: Re-select connector pairs and compare them with the previous connectors per zone
+    with stage("select connector pairs"):
+        connector_pairs, _ = select_connector_pairs(
+            activity_node_df, candidate_node_df, zone_df, connected_activity_nodes=connected_activity_nodes,
+            **{name: value for name, value in build_options.items()
+               if name in ('length_method', 'connectors_per_zone', 'connector_radius', 'zone_boundary_df',
+                           'workers', 'tile_size')})
+    new_pairs = pd.DataFrame({'zone_id': connector_pairs['zone_id'], 'node_id': connector_pairs['node_id'],
+                              'length': connector_pairs['length']})
+    previous_connectors = previous_network['connector_links']
+    zone_rows = previous_connectors['from_node_id'].isin(state['zone_ids'])
+    previous_pairs = pd.DataFrame({
+        'zone_id': previous_connectors.loc[zone_rows, 'from_node_id'].to_numpy(dtype=np.int64),
+        'node_id': previous_connectors.loc[zone_rows, 'to_node_id'].to_numpy(dtype=np.int64),
+        'length': previous_connectors.loc[zone_rows, 'length'].astype(float).to_numpy(),
+    })
+    pair_changes = new_pairs.merge(previous_pairs, how='outer', indicator=True)
+    changed_node_ids = updated_node_df.loc[changed_nodes, 'new_node_id'].to_numpy()
+    affected_zone_ids = np.union1d(
+        pair_changes.loc[pair_changes['_merge'] != 'both', 'zone_id'].to_numpy(dtype=np.int64),
+        np.union1d(state['zone_ids'][changed_zones],
+                   new_pairs.loc[new_pairs['node_id'].isin(changed_node_ids), 'zone_id'].to_numpy()))
+    print(f"Regenerating connectors for {len(affected_zone_ids)} affected zones...")
+
+    # Step 3: Build the affected connectors only
+    affected = np.isin(connector_pairs['zone_id'], affected_zone_ids)
+    new_connectors_df = _create_connector_links_df(
+        {name: values[affected] for name, values in connector_pairs.items()})
+
+    def is_affected_connector(links_df):
+        return ((links_df['link_type_name'] == 'connector')
+                & (links_df['from_node_id'].isin(affected_zone_ids) | links_df['to_node_id'].isin(affected_zone_ids)))
+
+    # Step 4: Splice them into the connector table and the forward-star-sorted link table, with
+    # the column types of a full build (those of an empty merge of the current links)
+    connector_links_df = pd.concat(
+        [_cast_like(previous_connectors[~is_affected_connector(previous_connectors)], new_connectors_df.dtypes),
+         new_connectors_df], ignore_index=True)
+    connector_links_df = _cast_like(connector_links_df, new_connectors_df.dtypes)
+    connector_links_df['link_id'] = range(1, len(connector_links_df) + 1)
+
+    link_dtypes = update_and_merge_links(link_df.iloc[:0], updated_node_df, new_connectors_df.iloc[:0]).dtypes
+    previous_links = _cast_like(previous_network['link_updated'], link_dtypes)
+    new_links_df = new_connectors_df.drop(columns=['link_id'])
+    new_links_df = new_links_df[[column for column in new_links_df.columns if column in previous_links.columns
+                                 or column in CONNECTOR_COORD_COLUMNS]]
+    link_updated_df = _splice_sorted_rows(
+        previous_links[~is_affected_connector(previous_links)].reset_index(drop=True),
+        ['from_node_id', 'to_node_id'], new_links_df)
+    link_updated_df['link_id'] = range(1, len(link_updated_df) + 1)
+    link_updated_df = _cast_like(link_updated_df, link_dtypes)
+
+    # Step 5: Replace the changed zone and node rows of the node table
+    changed_rows_df = create_updated_node_df(updated_node_df[changed_nodes], zone_df[changed_zones])
+    previous_nodes = _cast_like(previous_network['node_updated'], changed_rows_df.dtypes)
+    node_updated_df = _splice_sorted_rows(
+        previous_nodes[~previous_nodes['node_id'].isin(changed_rows_df['node_id'])].reset_index(drop=True),
+        ['node_id'], changed_rows_df[[column for column in changed_rows_df.columns if column in previous_nodes.columns]])
+    node_updated_df = _cast_like(node_updated_df, changed_rows_df.dtypes)
+
+    # Step 6: Save the spliced tables and the new build state
+    save_network_table(connector_links_df, output_path, "connector_links", output_format, csv_engine,
+                       transform=materialize_link_geometry)
+    save_network_table(link_updated_df, output_path, "link_updated", output_format, csv_engine,
+                       transform=materialize_link_geometry)
+    save_network_table(node_updated_df, output_path, "node_updated", output_format, csv_engine)
+    save_forward_star_index(link_updated_df, node_updated_df, output_path)
+    np.savez(state_file, **state)
+    print(f"Incremental update saved to '{output_path}'.")
+
+    network = {
+        'connector_links': connector_links_df,
+        'link_updated': link_updated_df,
+        'node_updated': node_updated_df,
+    }
+    if changed_nodes.any():
+        network.update({'activity_node': activity_node_df, 'common_node': common_node_df})
+    return network
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Connect zone centroids to a GMNS physical network (step 3).")
+    parser.add_argument("--input-dir", default=os.getcwd(),
+                        help="Folder containing node.csv, link.csv and zone_centroid.csv (default: current directory)")
+    parser.add_argument("--input-format", choices=GMNS_TABLE_FORMATS, default="csv",
+                        help="File format of the node, link and zone centroid tables (default: csv)")
+    parser.add_argument("--output-dir", default=None,
+                        help="Folder for the connected network (default: <input-dir>/connected_network)")
+    parser.add_argument("--output-format", choices=GMNS_TABLE_FORMATS, default="csv",
+                        help="File format of the step 3 tables; link_updated and node_updated are also written as CSV for DTALite (default: csv)")
+    parser.add_argument("--csv-engine", choices=CSV_ENGINES, default="pandas",
+                        help="CSV writer; pyarrow formats chunks on several threads (default: pandas)")
+    parser.add_argument("--length-method", choices=LENGTH_METHODS, default="vincenty",
+                        help="Connector length computation (default: vincenty)")
+    parser.add_argument("--connectors-per-zone", type=int, default=1,
+                        help="Target number of connectors per zone (default: 1)")
+    parser.add_argument("--connector-radius", type=float, default=None,
+                        help="Maximum length in meters of top-up connectors (default: no limit)")
+    parser.add_argument("--connector-link-types", nargs="+", default=None,
+                        help="Only connect zones to nodes on links of these types, e.g. primary secondary")
+    parser.add_argument("--zone-boundary", default=None,
+                        help="zone_boundary.csv (or .parquet/.feather) from Read_Zone_Data; assigns activity nodes to the zone polygon containing them")
+    parser.add_argument("--largest-scc", action="store_true",
+                        help="Only connect zones to nodes in the largest strongly connected component")
+    parser.add_argument("--snap-to-links", action="store_true",
+                        help="Connect zones without activity nodes to a new node on their nearest link")
+    parser.add_argument("--dense-node-ids", action="store_true",
+                        help="Number nodes consecutively after the zones instead of offsetting osm2gmns ids")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processes for tiled connector generation (default: single process)")
+    parser.add_argument("--tile-size", type=float, default=None,
+                        help="Tile side for --workers, in degrees or in meters with --length-method projected (default: about four tiles per worker)")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Also record the peak Python memory of every stage in timings.json with tracemalloc (slower)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only regenerate connectors of zones affected by zone/node edits since the last run in --output-dir")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    input_path = args.input_dir
+    output_path = args.output_dir or os.path.join(input_path, "connected_network")
+
+    link_file = os.path.join(input_path, f"link.{args.input_format}")
+    node_file = os.path.join(input_path, f"node.{args.input_format}")
+    node_taz_file = os.path.join(input_path, f"zone_centroid.{args.input_format}")
+
+    with StageTimer(trace_memory=args.trace_memory) as timer:
+        # Import the tables as DataFrames with compact GMNS column types
+        with stage("load inputs"):
+            with stage("load link"):
+                link_df = read_gmns_table(link_file)
+            with stage("load node"):
+                node_df = read_gmns_table(node_file)
+            with stage("load zone_centroid"):
+                node_taz_df = read_gmns_table(node_taz_file)
+            zone_boundary_df = None
+            if args.zone_boundary:
+                with stage("load zone_boundary"):
+                    zone_boundary_df = read_gmns_table(args.zone_boundary)
+
+        # Start timing
+        start_time = time.time()
+
+        build_options = dict(length_method=args.length_method, connectors_per_zone=args.connectors_per_zone,
+                             connector_radius=args.connector_radius, connector_link_types=args.connector_link_types,
+                             zone_boundary_df=zone_boundary_df, workers=args.workers, tile_size=args.tile_size,
+                             largest_scc_only=args.largest_scc, snap_to_links=args.snap_to_links,
+                             dense_node_ids=args.dense_node_ids, output_format=args.output_format,
+                             csv_engine=args.csv_engine)
+        with stage("build"):
+            if args.incremental:
+                build_connected_network_incremental(node_df, link_df, node_taz_df, output_path, **build_options)
+            else:
+                build_connected_network(node_df, link_df, node_taz_df, output_path, **build_options)
+
+        # End timing
+        end_time = time.time()
+
+    # Print the computational time and save the stage timings next to the outputs
+    print(f"Computational time: {end_time - start_time:.2f} seconds")
+    timer.print_summary()
+    timer.save(os.path.join(output_path, TIMINGS_FILE))
+
+
+if __name__ == "__main__":
+    main()
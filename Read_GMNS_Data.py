@@ -0,0 +1,292 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Target dtypes of the GMNS columns used across the pipeline. Numeric columns are narrowed
+# after parsing, integer ones only when every value is integral, so ids written as "1.0"
+# still load and integer columns with empty cells become nullable (e.g. Int32 for zone_id).
+# Columns holding text where numbers are expected (e.g. "123;456" in osm_way_id) are kept as read.
+GMNS_COLUMN_TYPES = {
+    # Node, link and zone ids
+    "node_id": "int32",
+    "new_node_id": "int32",
+    "old_node_id": "int32",
+    "zone_id": "int32",
+    "link_id": "int32",
+    "from_node_id": "int32",
+    "to_node_id": "int32",
+    "osm_node_id": "int64",
+    "osm_way_id": "int64",
+    # Small integer attributes
+    "is_boundary": "int8",
+    "directed": "int8",
+    "dir_flag": "int8",
+    "from_biway": "int8",
+    "is_link": "int8",
+    "link_type": "int16",
+    "lanes": "int16",
+    "free_speed": "int32",
+    "capacity": "int32",
+    # Coordinates and lengths keep full precision
+    "x_coord": "float64",
+    "y_coord": "float64",
+    "length": "float64",
+    # VDF attributes and volumes; float32 only with narrow_floats=True, since their values then
+    # differ from the CSV text in the last digits (e.g. 0.15 becomes 0.15000000596046448)
+    "vdf_toll": "float32",
+    "vdf_alpha": "float32",
+    "vdf_beta": "float32",
+    "vdf_plf": "float32",
+    "vdf_length_mi": "float32",
+    "vdf_free_speed_mph": "float32",
+    "free_speed_in_mph_raw": "float32",
+    "vdf_fftt": "float32",
+    "ref_volume": "float32",
+    "base_volume": "float32",
+    "base_vol_auto": "float32",
+    "obs_volume": "float32",
+    # Enumerations
+    "link_type_name": "category",
+    "facility_type": "category",
+    "allowed_uses": "category",
+    "ctrl_type": "category",
+    "activity_type": "category",
+    "name": "category",
+    "restricted_turn_nodes": "category",
+}
+
+INTEGER_DTYPES = ("int8", "int16", "int32", "int64")
+
+
+def _gmns_column_types(narrow_floats=False):
+    """Returns GMNS_COLUMN_TYPES, with the float32 columns kept as float64 unless narrow_floats is set."""
+    if narrow_floats:
+        return GMNS_COLUMN_TYPES
+    return {name: "float64" if dtype == "float32" else dtype for name, dtype in GMNS_COLUMN_TYPES.items()}
+
+# File formats of GMNS tables, by extension. CSV stays the exchange format for DTALite.
+GMNS_TABLE_FORMATS = ("csv", "parquet", "feather")
+
+# CSV writers of write_gmns_csv, and the rows each formats at a time
+CSV_ENGINES = ("pandas", "pyarrow")
+CSV_CHUNK_ROWS = 100_000
+
+
+def _narrow_integers(values, dtype):
+    """
+    Converts float values to the integer dtype, or to the smallest wider one that holds them.
+
+    Returns:
+        The integer array (nullable when values has NaN), or values unchanged when
+        some value is not integral.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    missing = np.isnan(values)
+    present = values[~missing]
+    if not np.array_equal(present, np.round(present)):
+        return values
+    for candidate in INTEGER_DTYPES[INTEGER_DTYPES.index(dtype):]:
+        limits = np.iinfo(candidate)
+        if len(present) == 0 or (limits.min <= present.min() and present.max() <= limits.max):
+            break
+    integers = np.where(missing, 0, values).astype(candidate)
+    if missing.any():
+        return pd.arrays.IntegerArray(integers, missing)
+    return integers
+
+
+def _read_with_pyarrow(file_path, columns, column_types):
+    """Parses the file with the multithreaded pyarrow CSV reader."""
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    convert_options = pa_csv.ConvertOptions(
+        column_types={name: pa.dictionary(pa.int32(), pa.string()) for name, dtype in column_types.items()
+                      if dtype == "category"},
+        include_columns=columns,
+        strings_can_be_null=True,
+    )
+    table = pa_csv.read_csv(file_path, convert_options=convert_options)
+    return {name: table.column(name).to_pandas() for name in table.column_names}
+
+
+def read_gmns_csv(file_path, columns=None, column_types=None, narrow_floats=False):
+    """
+    Loads a GMNS CSV file (node, link, zone centroid, ...) with compact column types.
+
+    Ids become int32 and enumerations such as link_type_name become categoricals (see
+    GMNS_COLUMN_TYPES). Other columns are inferred. The file is parsed with the pyarrow CSV
+    engine when pyarrow is installed, and with pandas otherwise.
+
+    Args:
+        file_path (str): Path to the CSV file.
+        columns (list of str, optional): Columns to load, e.g. to skip 'geometry'. Default is None (all).
+        column_types (dict, optional): Column dtypes overriding GMNS_COLUMN_TYPES.
+        narrow_floats (bool): Load the VDF attributes and volumes as float32, which halves them
+                              but changes their values in the last digits. Default is False.
+
+    Returns:
+        pd.DataFrame: The table with its columns in file order.
+    """
+    column_types = {**_gmns_column_types(narrow_floats), **(column_types or {})}
+    try:
+        raw_columns = _read_with_pyarrow(file_path, columns, column_types)
+    except ImportError:
+        raw_df = pd.read_csv(file_path, usecols=columns, low_memory=False)
+        raw_columns = {name: raw_df[name] for name in raw_df.columns}
+    return _apply_column_types(raw_columns, column_types)
+
+
+def _apply_column_types(raw_columns, column_types):
+    """Converts each column of the name -> Series dict to its target type, where it fits."""
+    typed_columns = {}
+    for name, values in raw_columns.items():
+        dtype = column_types.get(name)
+        # Columns without any value (e.g. ref_volume before assignment) take the target type too
+        numeric = values.dtype.kind in "iuf" or values.isna().all()
+        if dtype in INTEGER_DTYPES and numeric:
+            typed_columns[name] = _narrow_integers(values, dtype)
+        elif (dtype in ("float32", "float64") and numeric) or dtype in ("category", "string"):
+            typed_columns[name] = values.astype(dtype)
+        else:
+            typed_columns[name] = values
+    return pd.DataFrame(typed_columns)
+
+
+def _table_format(file_path):
+    """Returns the GMNS table format of file_path from its extension."""
+    table_format = os.path.splitext(file_path)[1].lstrip(".").lower()
+    if table_format not in GMNS_TABLE_FORMATS:
+        raise ValueError(f"Unsupported GMNS table format '{table_format}' of {file_path}; "
+                         f"expected one of {GMNS_TABLE_FORMATS}.")
+    return table_format
+
+
+def read_gmns_table(file_path, columns=None, narrow_floats=False):
+    """
+    Loads a GMNS table from a .csv, .parquet or .feather file.
+
+    CSV files are parsed by read_gmns_csv. Parquet and Feather files already store the column
+    types they were written with (see write_gmns_table), so they are read as they are.
+
+    Args:
+        file_path (str): Path to the table; the extension selects the format.
+        columns (list of str, optional): Columns to load. Default is None (all).
+        narrow_floats (bool): Load the VDF attributes and volumes of CSV files as float32
+                              (see read_gmns_csv). Default is False.
+
+    Returns:
+        pd.DataFrame: The table with its columns in file order.
+    """
+    table_format = _table_format(file_path)
+    if table_format == "parquet":
+        return pd.read_parquet(file_path, columns=columns)
+    if table_format == "feather":
+        return pd.read_feather(file_path, columns=columns)
+    return read_gmns_csv(file_path, columns=columns, narrow_floats=narrow_floats)
+
+
+def _to_arrow_compatible(df):
+    """
+    Returns the columns of df as a dict that Arrow can convert: object columns holding numbers
+    become numeric, and those mixing numbers and text or holding no value become strings.
+    """
+    columns = {}
+    for name in df.columns:
+        values = df[name]
+        if values.dtype == object:
+            inferred = pd.api.types.infer_dtype(values, skipna=True)
+            if inferred in ("integer", "floating", "mixed-integer-float"):
+                values = pd.to_numeric(values)
+            elif inferred.startswith("mixed") or inferred == "empty":
+                values = values.astype("string")
+        columns[name] = values
+    return columns
+
+
+def _to_arrow_columns(df, narrow_floats=False):
+    """
+    Prepares df for a columnar file with the compact GMNS types, so enumerations become
+    categoricals, which Arrow stores dictionary-encoded.
+    """
+    return _apply_column_types(_to_arrow_compatible(df), _gmns_column_types(narrow_floats))
+
+
+def write_gmns_csv(df, file_path, engine="pandas", chunk_rows=CSV_CHUNK_ROWS, transform=None):
+    """
+    Streams a GMNS table to a CSV file, chunk_rows rows at a time.
+
+    Only one chunk is formatted at a time, so the text buffer stays bounded by the chunk size
+    instead of growing with the network. The pandas engine writes the same text as df.to_csv.
+    The pyarrow engine formats each chunk with the multithreaded Arrow CSV writer; it quotes
+    every string and writes whole floats without a decimal part (55 instead of 55.0), which
+    CSV readers such as DTALite parse the same way.
+
+    Args:
+        df (pd.DataFrame): The table, in the row order to write. Its index is not saved.
+        file_path (str): Output CSV path.
+        engine (str): One of CSV_ENGINES. Default is 'pandas'.
+        chunk_rows (int): Rows formatted at a time. Default is CSV_CHUNK_ROWS.
+        transform (callable, optional): Applied to each chunk before formatting, so columns
+                                        derived for the file only (e.g. connector geometry)
+                                        are built one chunk at a time too. Default is None.
+
+    Returns:
+        str: file_path.
+    """
+    if engine not in CSV_ENGINES:
+        raise ValueError(f"Unknown CSV engine '{engine}'; expected one of {CSV_ENGINES}.")
+
+    def chunks():
+        # An empty table still yields one chunk, so the header is written
+        for start in range(0, max(len(df), 1), chunk_rows):
+            chunk = df.iloc[start:start + chunk_rows]
+            yield start == 0, chunk if transform is None else transform(chunk)
+
+    if engine == "pyarrow":
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+
+        with pa.OSFile(file_path, "wb") as sink:
+            for first, chunk in chunks():
+                table = pa.Table.from_pydict(_to_arrow_compatible(chunk))
+                pa_csv.write_csv(table, sink, pa_csv.WriteOptions(include_header=first))
+    else:
+        with open(file_path, "w", newline="", encoding="utf-8") as f:
+            for first, chunk in chunks():
+                chunk.to_csv(f, header=first, index=False)
+    return file_path
+
+
+def write_gmns_table(df, file_path, csv_engine="pandas", transform=None, narrow_floats=False):
+    """
+    Saves a GMNS table to a .csv, .parquet or .feather file.
+
+    CSV files are streamed in chunks by write_gmns_csv. Parquet and Feather keep the column
+    types, so the table loads back without re-parsing text; string enumerations such as
+    link_type_name are dictionary-encoded.
+
+    Args:
+        df (pd.DataFrame): The table. Its index is not saved.
+        file_path (str): Output path; the extension selects the format.
+        csv_engine (str): CSV writer, one of CSV_ENGINES. Default is 'pandas'.
+        transform (callable, optional): Applied to df before writing, chunk by chunk for CSV
+                                        (see write_gmns_csv). Default is None.
+        narrow_floats (bool): Store the VDF attributes and volumes of Parquet and Feather files
+                              as float32, which changes their values in the last digits.
+                              Default is False, which keeps them as float64.
+
+    Returns:
+        str: file_path.
+    """
+    table_format = _table_format(file_path)
+    if table_format == "csv":
+        return write_gmns_csv(df, file_path, engine=csv_engine, transform=transform)
+    if transform is not None:
+        df = transform(df)
+    if table_format == "parquet":
+        _to_arrow_columns(df, narrow_floats).to_parquet(file_path, index=False)
+    else:
+        _to_arrow_columns(df, narrow_floats).reset_index(drop=True).to_feather(file_path)
+    return file_path
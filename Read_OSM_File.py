@@ -3,12 +3,15 @@
 # Reference: https://pypi.org/project/osm2gmns/1.0.1/
 
 
+import argparse
 import csv
 import os
 import osm2gmns as og
 
+from Read_GMNS_Data import GMNS_TABLE_FORMATS, read_gmns_csv, write_gmns_table
 
-def osm2gmns_network():
+
+def osm2gmns_network(output_format="csv"):
 
     input_file = r"data/Tempe.osm" # Update this file name to match your osm
     # option 1: for urban networks
@@ -23,6 +26,22 @@ def osm2gmns_network():
 
     # Output the processed network
     og.outputNetToCSV(net)
-    
+
+    # Optional Parquet/Feather copies of node.csv and link.csv, which load faster in step 3
+    if output_format != "csv":
+        for table_name in ("node", "link"):
+            write_gmns_table(read_gmns_csv(f"{table_name}.csv"), f"{table_name}.{output_format}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Extract the physical network from an OSM file as node.csv and link.csv (step 2).")
+    parser.add_argument("--output-format", choices=GMNS_TABLE_FORMATS, default="csv",
+                        help="Also write Parquet/Feather copies of node.csv and link.csv (default: csv only)")
+    return parser.parse_args(argv)
+
+
 #main program
-osm2gmns_network()
+if __name__ == "__main__":
+    args = parse_args()
+    osm2gmns_network(output_format=args.output_format)
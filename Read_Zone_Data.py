@@ -1,126 +1,345 @@
+import argparse
 import csv
+import functools
 import geopandas as gpd
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
+import pyproj
+import shapely
 import sys
-from shapely.geometry import Point
 import os
+from concurrent.futures import ProcessPoolExecutor
 
-# Get current directory
-current_dir = os.getcwd()
+from Read_GMNS_Data import GMNS_TABLE_FORMATS, read_gmns_csv, write_gmns_table
 
-# Path to the 'data' folder
-data_folder = os.path.join(current_dir, "data")
 
-# Automatically find the first .shp file in the data folder
-shapefile_path = None
-for file in os.listdir(data_folder):
-    if file.endswith(".shp"):
-        shapefile_path = os.path.join(data_folder, file)
-        break
+# Function to find the first .shp file in the data folder
+def find_shapefile(data_folder):
+    for file in os.listdir(data_folder):
+        if file.endswith(".shp"):
+            return os.path.join(data_folder, file)
 
-# Raise error if no shapefile is found
-if shapefile_path is None:
+    # Raise error if no shapefile is found
     raise FileNotFoundError("No .shp file found in the 'data' folder.")
 
+# Function to load only the given attribute columns and the zone polygons, optionally only those
+# intersecting bbox or mask (GeoSeries/GeoDataFrame in any CRS, or a tuple/shapely geometry in the
+# layer's CRS). pyogrio reads them through Arrow and GDAL filters the features before they are parsed
+def load_zone_layer(shapefile_path, columns=None, bbox=None, mask=None):
+    try:
+        import pyogrio
+    except ImportError:
+        pyogrio = None
+
+    if pyogrio is None:
+        gdf = gpd.read_file(shapefile_path, bbox=bbox, mask=mask)
+        return gdf if columns is None else gdf[[column for column in columns if column in gdf.columns] + ['geometry']]
+
+    try:
+        import pyarrow
+        use_arrow = True
+    except ImportError:
+        use_arrow = False
+    return gpd.read_file(shapefile_path, engine="pyogrio", use_arrow=use_arrow, columns=columns,
+                         bbox=bbox, mask=mask)
+
+# Function to get the extent of a GMNS node.csv (e.g. the OSM network from step 2) as a
+# WGS84 box, grown by margin degrees, to load only the zones around the network
+def get_network_bbox(node_csv_path, margin=0.0):
+    node_df = read_gmns_csv(node_csv_path, columns=['x_coord', 'y_coord'])
+    min_x, min_y = node_df['x_coord'].min() - margin, node_df['y_coord'].min() - margin
+    max_x, max_y = node_df['x_coord'].max() + margin, node_df['y_coord'].max() + margin
+    return gpd.GeoSeries([shapely.box(min_x, min_y, max_x, max_y)], crs="EPSG:4326")
+
+# Transformers are costly to build, so one is kept per (source, target) CRS pair
+@functools.lru_cache(maxsize=None)
+def get_transformer(source_crs, target_crs):
+    return pyproj.Transformer.from_crs(source_crs, target_crs, always_xy=True)
+
+# Function to pick the projected CRS centroids are computed in: the layer's own CRS when it is
+# a local projected one (e.g. state plane), otherwise a Lambert azimuthal equal-area CRS
+# centered on the layer, which keeps the area weighting of the centroid exact
+def get_centroid_crs(gdf):
+    if gdf.crs.is_projected and gdf.crs.to_epsg() not in (3857, 900913):
+        return gdf.crs
+
+    min_x, min_y, max_x, max_y = gdf.total_bounds
+    center_x, center_y = (min_x + max_x) / 2, (min_y + max_y) / 2
+    if gdf.crs.is_projected:
+        center_x, center_y = get_transformer(gdf.crs.to_wkt(), "EPSG:4326").transform(center_x, center_y)
+    return pyproj.CRS.from_proj4(f"+proj=laea +lat_0={center_y} +lon_0={center_x} +datum=WGS84 +units=m +no_defs")
+
 # Function to calculate centroids, store x/y, and update geometry
 def calculate_centroids(gdf):
-    # Reproject to WGS84 (EPSG:4326) for output
-    if gdf.crs.to_epsg() != 4326:
-        gdf = gdf.to_crs(epsg=4326)
+    # Compute the centroids in a projected CRS, reprojecting the polygons at most once for them
+    centroid_crs = get_centroid_crs(gdf)
+    polygons = gdf.geometry if gdf.crs == centroid_crs else gdf.geometry.to_crs(centroid_crs)
+    centroids = shapely.centroid(polygons.to_numpy())
 
-    # Project to a metric CRS for accurate centroid calculation
-    gdf_projected = gdf.to_crs(epsg=3857)
-    centroids = gdf_projected.geometry.centroid
+    # Only the centroid coordinates are transformed back to WGS84 (EPSG:4326)
+    x_coords, y_coords = get_transformer(centroid_crs.to_wkt(), "EPSG:4326").transform(
+        shapely.get_x(centroids), shapely.get_y(centroids))
 
-    # Reproject centroids back to EPSG:4326
-    centroids_latlon = gpd.GeoSeries(centroids, crs=3857).to_crs(epsg=4326)
+    # Reproject the polygons to WGS84 for output
+    if gdf.crs.to_epsg() != 4326:
+        gdf = gdf.to_crs(epsg=4326)
 
-    # Build x/y columns
+    # Build x/y columns and keep the zone polygons for containment-based zone assignment
     gdf = gdf.copy()
-    gdf['x_coord'] = centroids_latlon.x
-    gdf['y_coord'] = centroids_latlon.y
+    gdf['x_coord'] = x_coords
+    gdf['y_coord'] = y_coords
+    gdf['boundary'] = gdf.geometry
 
-    # Replace geometry with the centroid point
-    gdf['geometry'] = gdf.apply(lambda row: Point(row['x_coord'], row['y_coord']), axis=1)
-    gdf = gpd.GeoDataFrame(gdf, geometry='geometry', crs='EPSG:4326')
+    # Replace geometry with the centroid point, built from the coordinate arrays in one call
+    gdf['geometry'] = gpd.points_from_xy(gdf['x_coord'], gdf['y_coord'], crs='EPSG:4326')
+    gdf = gdf.set_geometry('geometry', crs='EPSG:4326')
 
     return gdf
 
 # Function to save centroids to CSV
-def save_centroids_to_csv(gdf, output_csv_path, taz_column):
-    nodes = []
-    node_id_counter = 1
-
-    for idx, row in gdf.iterrows():
-        if row['geometry'] is None:
-            continue
-        
-        geometry_wkt = row['geometry'].wkt.replace("\n", " ")
-        TAZ_id = str(row[taz_column])
-        
-        nodes.append({
-            "name": TAZ_id,
-            "node_id": node_id_counter,
-            "osm_node_id": "",
-            "x_coord": row['x_coord'],
-            "y_coord": row['y_coord'],
-            "zone_id": node_id_counter,
-            "TAZ_ID": TAZ_id,
-            "geometry": geometry_wkt,
-            "notes": " "
-        })
-        node_id_counter += 1
+def save_centroids_to_csv(gdf, output_csv_path, taz_column, first_zone_id=1):
+    # Zones without geometry are skipped; the others are numbered consecutively from first_zone_id
+    gdf = gdf[gdf['geometry'].notna()]
+    node_ids = np.arange(first_zone_id, first_zone_id + len(gdf))
+    taz_ids = gdf[taz_column].map(str).to_numpy()
 
-    nodes_df = pd.DataFrame(nodes)
+    nodes_df = pd.DataFrame({
+        "name": taz_ids,
+        "node_id": node_ids,
+        "osm_node_id": "",
+        "x_coord": gdf['x_coord'].to_numpy(),
+        "y_coord": gdf['y_coord'].to_numpy(),
+        "zone_id": node_ids,
+        "TAZ_ID": taz_ids,
+        "geometry": shapely.to_wkt(gdf.geometry.to_numpy(), rounding_precision=-1),
+        "notes": " ",
+    })
     nodes_df = nodes_df.dropna()
     nodes_df.to_csv(output_csv_path, index=False, quoting=csv.QUOTE_ALL, encoding='utf-8')
     print(f"Centroid data saved to {output_csv_path}")
+    return nodes_df
+
+# Function to save zone polygons to CSV, numbered like save_centroids_to_csv
+def save_zone_boundaries_to_csv(gdf, output_csv_path, taz_column, first_zone_id=1):
+    gdf = gdf[gdf['geometry'].notna()]
+    boundaries_df = pd.DataFrame({
+        "zone_id": range(first_zone_id, first_zone_id + len(gdf)),
+        "TAZ_ID": gdf[taz_column].astype(str).to_numpy(),
+        "geometry": shapely.to_wkt(gdf['boundary'].to_numpy(), rounding_precision=-1),
+    })
+    boundaries_df.to_csv(output_csv_path, index=False, quoting=csv.QUOTE_ALL, encoding='utf-8')
+    print(f"Zone boundary data saved to {output_csv_path}")
+    return boundaries_df
+
+# Function to pick the labels to draw: all of them up to max_labels, otherwise only labels that do
+# not collide with one kept before them, so large zone sets are not drawn as overlapping texts
+def select_labels(ax, x_coords, y_coords, labels, fontsize, max_labels):
+    if len(labels) <= max_labels:
+        return np.arange(len(labels))
+
+    # Positions and label size, with some padding, in points on the axes once the aspect ratio has been applied
+    (min_x, max_x), (min_y, max_y) = ax.get_xlim(), ax.get_ylim()
+    ax.apply_aspect()
+    figure_width, figure_height = ax.figure.get_size_inches() * 72
+    position = ax.get_position()
+    x_points = (x_coords - min_x) / (max_x - min_x) * figure_width * position.width
+    y_points = (y_coords - min_y) / (max_y - min_y) * figure_height * position.height
+    label_width = fontsize * 0.65 * (max(labels.str.len().max(), 1) + 1)
+    label_height = fontsize * 1.5
+
+    # Only the first zone of each label-sized cell is a candidate, and a colliding label can only
+    # be in one of the 8 neighboring cells
+    cells = np.floor(x_points / label_width).astype(np.int64), np.floor(y_points / label_height).astype(np.int64)
+    _, candidates = np.unique(np.column_stack(cells), axis=0, return_index=True)
+    kept = {}
+    for index in np.sort(candidates):
+        cell_x, cell_y = cells[0][index], cells[1][index]
+        collides = any(
+            abs(x_points[index] - x_points[other]) < label_width and abs(y_points[index] - y_points[other]) < label_height
+            for other in (kept.get((cell_x + dx, cell_y + dy)) for dx in (-1, 0, 1) for dy in (-1, 0, 1))
+            if other is not None)
+        if not collides:
+            kept[(cell_x, cell_y)] = index
+    return np.sort(np.fromiter(kept.values(), dtype=np.int64))
 
-# Plot centroid points with labels
-def plot_taz_with_centroids(gdf, taz_column):
-    ax = gdf.plot(figsize=(12, 8), color='red', markersize=10)
+# Plot centroid points with labels. With output_path (e.g. .png or .svg) the figure is written to
+# the file instead of being shown, so the script can run unattended
+def plot_taz_with_centroids(gdf, taz_column, output_path=None, max_labels=1000):
+    x_coords = gdf['x_coord'].to_numpy()
+    y_coords = gdf['y_coord'].to_numpy()
+    labels = gdf[taz_column].map(str)
 
-    for idx, row in gdf.iterrows():
-        plt.text(row['geometry'].x, row['geometry'].y, str(row[taz_column]),
-                 fontsize=8, ha='center', color='blue')
+    fig, ax = plt.subplots(figsize=(12, 8))
+    ax.scatter(x_coords, y_coords, color='red', s=10)
+    # Same aspect ratio as GeoDataFrame.plot for longitude/latitude
+    if len(gdf) > 0:
+        ax.set_aspect(1 / np.cos(np.deg2rad(np.nanmean(y_coords))))
 
-    plt.title("TAZ Centroid Points", fontsize=16)
-    plt.xlabel("Longitude", fontsize=12)
-    plt.ylabel("Latitude", fontsize=12)
-    plt.grid(True)
-    plt.show()
+    label_index = select_labels(ax, x_coords, y_coords, labels, 8, max_labels)
+    for x, y, label in zip(x_coords[label_index], y_coords[label_index], labels.to_numpy()[label_index]):
+        ax.text(x, y, label, fontsize=8, ha='center', color='blue')
+    if len(label_index) < len(labels):
+        print(f"Labeled {len(label_index)} of {len(labels)} zones to avoid overlapping labels.")
+
+    ax.set_title("TAZ Centroid Points", fontsize=16)
+    ax.set_xlabel("Longitude", fontsize=12)
+    ax.set_ylabel("Latitude", fontsize=12)
+    ax.grid(True)
+
+    if output_path is None:
+        plt.show()
+    else:
+        fig.savefig(output_path, dpi=150, bbox_inches='tight')
+        plt.close(fig)
+        print(f"Zone plot saved to {output_path}")
+
+# Function to run the whole step for one region: load its zones, compute the centroids and write
+# zone_centroid and zone_boundary to output_folder, numbering the zones from first_zone_id.
+# Raises ValueError if the zone id column is missing or the region has more than max_zone_count zones
+def process_zone_region(shapefile_path, taz_column, output_folder, region=None, first_zone_id=1,
+                        max_zone_count=None, network_node_file=None, output_format="csv",
+                        plot_zones=False, plot_file=None):
+    region = region or os.path.splitext(os.path.basename(shapefile_path))[0]
+
+    # Load the zone id column and the polygons of the shapefile
+    bbox = get_network_bbox(network_node_file) if network_node_file else None
+    gdf = load_zone_layer(shapefile_path, columns=[taz_column], bbox=bbox)
+    print(f"[{region}] Shapefile loaded successfully: {len(gdf)} zones.")
+
+    if gdf.crs is None:
+        print(f"[{region}] CRS is missing. Setting default CRS to EPSG:2868.")
+        gdf.set_crs(epsg=2868, inplace=True)
+
+    print(f"[{region}] Current CRS:", gdf.crs)
+    if taz_column not in gdf.columns:
+        raise ValueError(f"Column '{taz_column}' not found in {shapefile_path}. Please check the attribute table.")
+    if max_zone_count is not None and len(gdf) > max_zone_count:
+        raise ValueError(f"{shapefile_path} has {len(gdf)} zones, more than the {max_zone_count} zone ids "
+                         f"reserved for region '{region}'.")
+
+    # Now correctly calculate and assign centroid-based geometry, reprojected to EPSG:4326
+    gdf = calculate_centroids(gdf)
+
+    # Plot and export
+    os.makedirs(output_folder, exist_ok=True)
+    if plot_zones:
+        plot_taz_with_centroids(gdf, taz_column, output_path=plot_file)
+
+    output_csv_path = os.path.join(output_folder, "zone_centroid.csv")
+    nodes_df = save_centroids_to_csv(gdf, output_csv_path, taz_column, first_zone_id)
+
+    boundary_csv_path = os.path.join(output_folder, "zone_boundary.csv")
+    boundaries_df = save_zone_boundaries_to_csv(gdf, boundary_csv_path, taz_column, first_zone_id)
+
+    if output_format != "csv":
+        write_gmns_table(nodes_df, os.path.splitext(output_csv_path)[0] + f".{output_format}")
+        write_gmns_table(boundaries_df, os.path.splitext(boundary_csv_path)[0] + f".{output_format}")
+
+    return {
+        "region": region,
+        "zone_count": len(nodes_df),
+        "first_zone_id": first_zone_id,
+        "last_zone_id": first_zone_id + len(nodes_df) - 1,
+        "output_folder": output_folder,
+    }
+
+# Function to process every region of a manifest CSV in a process pool, writing the files of each to
+# output_folder/<region>. Columns: region, shapefile, taz_column, zone_id_start, and optionally
+# network_node_file (see get_network_bbox); relative paths are resolved against the manifest folder.
+# Each region numbers its zones from its zone_id_start, so ids do not depend on the manifest order or
+# the other rows, and may use the ids up to the next region's zone_id_start; a region with more zones
+# is rejected before its files are written. The id ranges are saved to output_folder/zone_regions.csv
+def process_zone_regions(manifest_path, output_folder, workers=None, output_format="csv", plot_zones=False):
+    manifest = pd.read_csv(manifest_path, dtype=str, keep_default_na=False)
+    missing_columns = {'region', 'shapefile', 'taz_column', 'zone_id_start'} - set(manifest.columns)
+    if missing_columns:
+        raise ValueError(f"Manifest {manifest_path} is missing the columns {sorted(missing_columns)}.")
+    duplicated = manifest['region'][manifest['region'].duplicated()]
+    if len(duplicated):
+        raise ValueError(f"Manifest {manifest_path} lists the regions {sorted(set(duplicated))} more than once.")
+    invalid = manifest['region'][~manifest['zone_id_start'].str.strip().str.fullmatch(r"[1-9]\d*")]
+    if len(invalid):
+        raise ValueError(f"Regions {list(invalid)} of {manifest_path} need a positive integer zone_id_start.")
+    zone_id_starts = manifest['zone_id_start'].astype(np.int64)
+    duplicated = manifest['region'][zone_id_starts.duplicated(keep=False)]
+    if len(duplicated):
+        raise ValueError(f"Regions {list(duplicated)} of {manifest_path} share a zone_id_start.")
+
+    # Each range ends where the next region, in zone id order, starts
+    sorted_starts = np.sort(zone_id_starts.to_numpy())
+    next_starts = np.append(sorted_starts[1:], 0)[np.searchsorted(sorted_starts, zone_id_starts.to_numpy())]
+
+    manifest_folder = os.path.dirname(os.path.abspath(manifest_path))
+    tasks = []
+    for row, zone_id_start, next_start in zip(manifest.itertuples(index=False), zone_id_starts, next_starts):
+        network_node_file = getattr(row, 'network_node_file', "")
+        region_folder = os.path.join(output_folder, row.region)
+        tasks.append({
+            'shapefile_path': os.path.join(manifest_folder, row.shapefile),
+            'taz_column': row.taz_column,
+            'output_folder': region_folder,
+            'region': row.region,
+            'first_zone_id': int(zone_id_start),
+            'max_zone_count': int(next_start - zone_id_start) if next_start else None,
+            'network_node_file': os.path.join(manifest_folder, network_node_file) if network_node_file else None,
+            'output_format': output_format,
+            'plot_zones': plot_zones,
+            'plot_file': os.path.join(region_folder, "zone_centroid.png"),
+        })
 
-# Load the shapefile
-try:
-    gdf = gpd.read_file(shapefile_path)
-    print("Shapefile loaded successfully.")
-except Exception as e:
-    print(f"Failed to load shapefile: {e}")
-    sys.exit()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(process_zone_region, **task) for task in tasks]
+        results = pd.DataFrame([future.result() for future in futures])
 
-if gdf.crs is None:
-    print("CRS is missing. Setting default CRS to EPSG:2868.")
-    gdf.set_crs(epsg=2868, inplace=True)
+    results.to_csv(os.path.join(output_folder, "zone_regions.csv"), index=False)
+    print(f"Processed {len(results)} regions with {results['zone_count'].sum()} zones into {output_folder}")
+    return results
 
-print("Current CRS:", gdf.crs)
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compute zone centroids and boundaries from zone shapefiles (step 1).")
+    parser.add_argument("--manifest", default=None,
+                        help="CSV of regions (region, shapefile, taz_column, zone_id_start, optional network_node_file) "
+                             "to process in parallel (default: the first shapefile in ./data)")
+    parser.add_argument("--output-dir", default="zone_results",
+                        help="Folder for the per-region outputs of --manifest (default: zone_results)")
+    parser.add_argument("--output-format", choices=GMNS_TABLE_FORMATS, default="csv",
+                        help="Also write Parquet/Feather copies of the outputs of --manifest (default: csv only)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processes for --manifest (default: one per CPU)")
+    parser.add_argument("--plot", action="store_true",
+                        help="Save a centroid plot of every region of --manifest")
+    return parser.parse_args(argv)
 
-if gdf.crs.to_epsg() != 4326:
-    gdf = gdf.to_crs(epsg=4326)
-    print("Reprojected CRS:", gdf.crs)
+def main(argv=None):
+    args = parse_args(argv)
+    if args.manifest:
+        process_zone_regions(args.manifest, args.output_dir, workers=args.workers, output_format=args.output_format,
+                             plot_zones=args.plot)
+        return
 
-print("Available columns:", gdf.columns)
+    # Automatically find the first .shp file in the 'data' folder of the current directory
+    shapefile_path = find_shapefile(os.path.join(os.getcwd(), "data"))
 
-taz_column = "TRACTCE"
-if taz_column not in gdf.columns:
-    print(f"Column '{taz_column}' not found. Please check the attribute table.")
-    sys.exit()
+    taz_column = "TRACTCE"
+    # "parquet" or "feather" also writes columnar copies of the CSV files, which load faster in step 3
+    output_format = "csv"
+    # node.csv of the network (step 2) to load only the zones within its extent, e.g. the tracts
+    # of one metro from a statewide file; None loads every zone
+    network_node_file = None
+    # Set plot_zones to False to skip the plot, or plot_file (e.g. "Tempe_test_results/zone_centroid.png")
+    # to save it without opening a window, e.g. in scheduled runs
+    plot_zones = True
+    plot_file = None
 
-# Now correctly calculate and assign centroid-based geometry
-gdf = calculate_centroids(gdf)
+    try:
+        process_zone_region(shapefile_path, taz_column, "Tempe_test_results", network_node_file=network_node_file,
+                            output_format=output_format, plot_zones=plot_zones, plot_file=plot_file)
+    except Exception as e:
+        print(f"Failed to process {shapefile_path}: {e}")
+        sys.exit()
 
-# Plot and export
-plot_taz_with_centroids(gdf, taz_column)
 
-output_csv_path = "Tempe_test_results/zone_centroid.csv"
-save_centroids_to_csv(gdf, output_csv_path, taz_column)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak RSS is then left out of the timings
+    resource = None
+
+# Timer recording the stage() spans of this process, set while a StageTimer is active
+_active_timer = None
+
+
+def _max_rss_mb():
+    """Returns the peak resident set size of this process so far in MB, or None if unknown."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return max_rss / 2**20 if sys.platform == "darwin" else max_rss / 2**10
+
+
+class StageTimer:
+    """
+    Records the wall time, CPU time and peak memory of nested pipeline stages.
+
+    Use it as a context manager around a run; every stage() span opened inside, in any
+    module, is recorded. Spans nest, and each is named by the path of its enclosing spans,
+    e.g. 'build/generate connectors/nearest centroid search'.
+
+    Each span records:
+        wall_s: Elapsed wall-clock seconds.
+        cpu_s: CPU seconds of this process on all its threads (not of worker processes).
+        max_rss_mb: Peak resident set size of the process at the end of the span. It only
+                    grows, so a span that raises it over the previous span is the one that
+                    set the high-water mark.
+        peak_traced_mb: Peak of the memory traced by tracemalloc during the span, counting
+                        allocations still alive from before it; only with trace_memory=True,
+                        which slows the run.
+
+    Args:
+        trace_memory (bool): Track allocations with tracemalloc for peak_traced_mb. Default is False.
+
+    Example:
+        with StageTimer() as timer:
+            with stage("load"):
+                ...
+        timer.save("timings.json")
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.spans = []
+        self._stack = []
+        self._started_tracing = False
+        self._previous_timer = None
+
+    def __enter__(self):
+        global _active_timer
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._previous_timer, _active_timer = _active_timer, self
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        global _active_timer
+        self.total_wall_s = time.perf_counter() - self._start_wall
+        self.total_cpu_s = time.process_time() - self._start_cpu
+        _active_timer = self._previous_timer
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        return False
+
+    def _traced_peak(self):
+        return tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0
+
+    @contextmanager
+    def span(self, name):
+        """Records one stage; see stage()."""
+        if self._stack:
+            # The enclosing span keeps the peak reached so far before the peak is reset for this one
+            parent = self._stack[-1]
+            parent['peak'] = max(parent['peak'], self._traced_peak())
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+
+        path = "/".join([entry['name'] for entry in self._stack] + [name])
+        entry = {'name': name, 'peak': 0}
+        record = {'name': path, 'depth': len(self._stack)}
+        self.spans.append(record)
+        self._stack.append(entry)
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield record
+        finally:
+            record['wall_s'] = time.perf_counter() - start_wall
+            record['cpu_s'] = time.process_time() - start_cpu
+            record['max_rss_mb'] = _max_rss_mb()
+            self._stack.pop()
+            peak = max(entry['peak'], self._traced_peak())
+            if tracemalloc.is_tracing():
+                record['peak_traced_mb'] = peak / 2**20
+                tracemalloc.reset_peak()
+            if self._stack:
+                self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak)
+
+    def report(self):
+        """Returns the recorded spans, in start order, and the totals as a dict."""
+        return {
+            'total_wall_s': getattr(self, 'total_wall_s', None),
+            'total_cpu_s': getattr(self, 'total_cpu_s', None),
+            'max_rss_mb': _max_rss_mb(),
+            'spans': self.spans,
+        }
+
+    def save(self, file_path):
+        """Writes report() as JSON to file_path, e.g. <output folder>/timings.json."""
+        folder = os.path.dirname(file_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(file_path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+        print(f"Stage timings saved to '{file_path}'.")
+
+    def print_summary(self):
+        """Prints one line per span, indented by depth."""
+        for record in self.spans:
+            memory = f", peak {record['peak_traced_mb']:.0f} MB traced" if 'peak_traced_mb' in record else ""
+            print(f"{'  ' * record['depth']}{record['name'].rsplit('/', 1)[-1]}: "
+                  f"{record.get('wall_s', 0):.2f} s wall, {record.get('cpu_s', 0):.2f} s CPU{memory}")
+
+
+@contextmanager
+def stage(name):
+    """
+    Context manager recording a pipeline stage in the active StageTimer.
+
+    It does nothing when no timer is active, so stages can be marked in library code at no cost.
+    """
+    if _active_timer is None:
+        yield None
+    else:
+        with _active_timer.span(name) as record:
+            yield record
@@ -1,4 +1,8 @@
+import contextlib
+import functools
+import inspect
 import os
+import sys
 import pandas as pd
 import json
 import math
@@ -11,6 +15,21 @@ import subprocess
 import time
 import DTALite
 
+# Stage_Timing.py from the root of zone2assignment times every check when it can be imported
+# (Network_Validator_Main.py puts the root on sys.path); without it the checks run untimed
+try:
+    from Stage_Timing import stage
+except ImportError:
+    def stage(name):
+        return contextlib.nullcontext()
+
+# Read_GMNS_Data.py from the same root loads the files with the compact GMNS column types;
+# without it they are loaded with plain pandas type inference
+try:
+    from Read_GMNS_Data import read_gmns_csv, read_gmns_table
+except ImportError:
+    read_gmns_csv = read_gmns_table = None
+
 flag_Run_Accessibility_Checking=True
 flag_Run_exe=False
 template_path='GMNS_Tools/Accessibility_checking_tools'
@@ -152,6 +171,23 @@ class ValidationResult:
         field_info = f" Field: {self.field}" if self.field else ""
         return f"{prefix}{field_info} - {self.message}"
 
+def timed_check(method):
+    """
+    Records each call of a validation method as a stage named after it (see Stage_Timing).
+    Methods run once per file, e.g. for node and link data, add their file_type to the name.
+    """
+    name = method.__name__.lstrip("_")
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        stage_name = name
+        if "file_type" in signature.parameters:
+            stage_name = f"{name} ({signature.bind(self, *args, **kwargs).arguments['file_type']})"
+        with stage(stage_name):
+            return method(self, *args, **kwargs)
+    return wrapper
+
 class GMNSValidator:
     """
     A comprehensive validator framework for networks based on GMNS standards.
@@ -386,8 +422,8 @@ class GMNSValidator:
         Initialize the validator with required data files.
         
         Args:
-            node_file: Path to the node CSV file
-            link_file: Path to the link CSV file
+            node_file: Path to the node CSV, Parquet or Feather file
+            link_file: Path to the link CSV, Parquet or Feather file
             demand_file: Optional path to the demand CSV file
             config_file: Optional path to configuration JSON file
         """
@@ -414,12 +450,30 @@ class GMNSValidator:
 
     
     def _load_csv(self, file_path: str) -> pd.DataFrame:
-        """Load a CSV file into a pandas DataFrame."""
+        """Load a CSV, Parquet or Feather file into a pandas DataFrame with compact column types."""
         try:
-            df = pd.read_csv(file_path, low_memory=False)
-            # Convert all column names to lowercase for consistency
-            df.columns = [col.lower() for col in df.columns]
-            return df
+            with stage(f"load {os.path.basename(file_path)}"):
+                extension = os.path.splitext(file_path)[1].lower()
+                if read_gmns_table is not None:
+                    # GMNS column types (see Read_GMNS_Data.GMNS_COLUMN_TYPES): int32 ids,
+                    # categorical enumerations; other extensions are parsed as CSV
+                    df = read_gmns_table(file_path) if extension in (".parquet", ".feather") \
+                        else read_gmns_csv(file_path)
+                elif extension == ".parquet":
+                    df = pd.read_parquet(file_path)
+                elif extension == ".feather":
+                    df = pd.read_feather(file_path)
+                else:
+                    df = pd.read_csv(file_path, low_memory=False)
+                # Nullable integers holding nulls (e.g. zone_id) become float, so that comparisons
+                # such as node_id == zone_id remain plain booleans
+                for column in df.columns:
+                    if isinstance(df[column].dtype, pd.api.extensions.ExtensionDtype) \
+                            and df[column].dtype.kind in "iu" and df[column].isna().any():
+                        df[column] = df[column].astype("float64")
+                # Convert all column names to lowercase for consistency
+                df.columns = [col.lower() for col in df.columns]
+                return df
         except Exception as e:
             self.results.append(
                 ValidationResult(
@@ -486,6 +540,7 @@ class GMNSValidator:
 
         return self.generate_report()
     
+    @timed_check
     def _validate_file_existence(self):
         """Validate that required files exist and are not empty."""
         if self.node_df is not None and self.node_df.empty:
@@ -504,6 +559,7 @@ class GMNSValidator:
                 )
             )
     
+    @timed_check
     def _validate_level_1(self):
         """
         Level 1: Basic validations for node and link files.
@@ -531,6 +587,7 @@ class GMNSValidator:
         self._check_duplicates(self.node_df, "node_id", "node")
         self._check_duplicates(self.link_df, "link_id", "link")
     
+    @timed_check
     def _validate_level_2(self):
         """
         Level 2: Demand and zone consistency validations.
@@ -564,6 +621,7 @@ class GMNSValidator:
                 )
             )
     
+    @timed_check
     def _validate_level_3(self):
         """
         Level 3: Network attribute validations.
@@ -582,6 +640,7 @@ class GMNSValidator:
         self._validate_unit_consistency()
         self._validate_level_2()
     
+    @timed_check
     def _validate_level_4(self):
         """
         Level 4: Single mode validation.
@@ -590,6 +649,7 @@ class GMNSValidator:
         self._validate_config_files()
         self._validate_level_3()
     
+    @timed_check
     def _validate_level_5(self):
         """
         Level 5: Observed volume checks and ODME validation.
@@ -603,6 +663,7 @@ class GMNSValidator:
         # Validate ODME settings and data
         self._validate_odme_configuration()
     
+    @timed_check
     def _validate_level_6(self):
         """
         Level 6: Accessibility checks
@@ -739,6 +800,7 @@ class GMNSValidator:
             )
         )
 
+    @timed_check
     def _validate_level_7(self):
         """
         Level 7: Traffic assignment validation
@@ -803,6 +865,7 @@ class GMNSValidator:
             )
         )
 
+    @timed_check
     def _validate_level_8(self):
         """
         Level 8: Post-OD Assignment Validation
@@ -931,6 +994,7 @@ class GMNSValidator:
             )
         )
 
+    @timed_check
     def _validate_link_performance(self, link_performance_file):
         """
         Validate link performance data from link_performance.csv.
@@ -1565,6 +1629,7 @@ class GMNSValidator:
                     field="reference_volume"
                 )
             )
+    @timed_check
     def _check_required_fields(self, df: pd.DataFrame, field_dict: Dict, file_type: str):
         """Check that all required fields are present."""
         required_fields = [field for field, attrs in field_dict.items() 
@@ -1581,6 +1646,7 @@ class GMNSValidator:
                 )
             )
     
+    @timed_check
     def _check_field_types(self, df: pd.DataFrame, field_dict: Dict, file_type: str):
         """Check that field data types match expected types, properly handling empty/null values."""
         for field, attrs in field_dict.items():
@@ -1663,6 +1729,7 @@ class GMNSValidator:
                 # No type validation needed for strings
                 pass
     
+    @timed_check
     def _check_duplicates(self, df: pd.DataFrame, id_field: str, file_type: str):
         """Check for duplicate ID values."""
         if id_field not in df.columns:
@@ -1681,6 +1748,7 @@ class GMNSValidator:
                 )
             )
     
+    @timed_check
     def _check_sorted_nodes(self):
         """Check if nodes are sorted by node_id."""
         if "node_id" not in self.node_df.columns:
@@ -1703,6 +1771,7 @@ class GMNSValidator:
                 )
             )
     
+    @timed_check
     def _check_sorted_links(self):
         """Check if links are sorted by from_node_id and to_node_id."""
         if "from_node_id" not in self.link_df.columns or "to_node_id" not in self.link_df.columns:
@@ -1729,13 +1798,14 @@ class GMNSValidator:
         
 
             
-        # Check to_node_id sorting within from_node_id groups
-        from_node_groups = self.link_df.groupby("from_node_id")
-        unsorted_groups = []
-        
-        for name, group in from_node_groups:
-            if not group["to_node_id"].is_monotonic_increasing:
-                unsorted_groups.append(name)
+        # Check to_node_id sorting within from_node_id groups: after a stable sort on
+        # from_node_id, a group is unsorted where to_node_id drops between neighbours
+        sorted_links = self.link_df[["from_node_id", "to_node_id"]].dropna(subset=["from_node_id"])
+        sorted_links = sorted_links.sort_values("from_node_id", kind="stable")
+        from_ids = sorted_links["from_node_id"].to_numpy()
+        to_ids = sorted_links["to_node_id"].to_numpy()
+        descending = (from_ids[1:] == from_ids[:-1]) & (to_ids[1:] < to_ids[:-1])
+        unsorted_groups = list(pd.unique(from_ids[1:][descending]))
         
         if unsorted_groups:
             self.results.append(
@@ -1755,6 +1825,7 @@ class GMNSValidator:
                 )
             )
     
+    @timed_check
     def _validate_link_endpoints(self):
         """Check that all link endpoints exist in the node file."""
         if (self.node_df.empty or self.link_df.empty or 
@@ -1791,6 +1862,7 @@ class GMNSValidator:
                 )
             )
     
+    @timed_check
     def _check_zone_centroid_structure(self):
         """
         Check node file structure with zone centroids at the beginning.
@@ -1941,6 +2013,7 @@ class GMNSValidator:
             )
         )
         
+    @timed_check
     def _validate_connectors(self):
         """
         Identify and validate connectors (links between centroids and physical nodes).
@@ -2028,6 +2101,7 @@ class GMNSValidator:
             )
             
                 
+    @timed_check
     def _validate_demand_format(self):
         """
         Validate the demand file has exactly the required three columns in the correct order:
@@ -2090,6 +2164,7 @@ class GMNSValidator:
                 )
             )
                 
+    @timed_check
     def _validate_zone_consistency(self):
         """Check that zones are consistent across node and demand files."""
         if self.node_df is None:
@@ -2165,6 +2240,7 @@ class GMNSValidator:
         else:
             print("\nWARNING: No demand file available to validate zone consistency")    
         
+    @timed_check
     def _validate_demand_zones(self):
         """Validate demand file zone IDs."""
         if (self.demand_df is None or self.demand_df.empty or 
@@ -2197,6 +2273,7 @@ class GMNSValidator:
                     )
                 )
     
+    @timed_check
     def _validate_vdf_parameters(self):
         """Validate volume delay function parameters."""
         vdf_fields = ["vdf_alpha", "vdf_beta", "vdf_fftt", "vdf_length_mi", "vdf_free_speed_mph"]
@@ -2233,6 +2310,7 @@ class GMNSValidator:
                     )
                 )
     
+    @timed_check
     def _validate_speed_units(self):
         """Validate that speed values are in expected units (km/h for free_speed, mph for vdf_free_speed_mph)."""
         # Check free_speed (km/h)
@@ -2289,6 +2367,7 @@ class GMNSValidator:
                     )
                 )
                 
+    @timed_check
     def _validate_length_units(self):
              """Validate that length values are in expected units (meters for length, miles for vdf_length_mi)."""
              # Check length (meters)
@@ -2505,6 +2584,7 @@ class GMNSValidator:
         
         print("\n=======================================")
         
+    @timed_check
     def _validate_capacity_values(self):
         """
         Validate capacity values for reasonableness and consistency with other fields.
@@ -2630,6 +2710,7 @@ class GMNSValidator:
             )
         )
         
+    @timed_check
     def _validate_unit_consistency(self):
         """
         Validate that unit conversions between related fields are consistent.
@@ -2802,6 +2883,7 @@ class GMNSValidator:
                         )
                     )
                     
+    @timed_check
     def _validate_config_files(self):
         """
         Validate configuration files: mode_type.csv and settings.csv.
@@ -3089,6 +3171,7 @@ class GMNSValidator:
     """
     
 
+    @timed_check
     def _validate_observed_volumes(self):
         """Validate observed volumes (obs_volume) in the link file for ODME."""
         if "obs_volume" not in self.link_df.columns:
@@ -3134,6 +3217,7 @@ class GMNSValidator:
                 )
             )
     
+    @timed_check
     def _validate_odme_configuration(self):
         """Validate ODME-specific settings and files."""
         # Check settings.csv for ODME configuration
@@ -3374,6 +3458,7 @@ class GMNSValidator:
             for target_file in found_target_files:
                 self._validate_demand_target_content(target_file)
         
+    @timed_check
     def _validate_demand_target_content(self, target_file=None):
         """
         Validate the content of a demand target file to ensure it is properly formatted.
@@ -3546,6 +3631,7 @@ class GMNSValidator:
                         details={"file": tgt_file}
                     )
                 )
+    @timed_check
     def _validate_demand_target_content(self):
         """Validate the content of demand target files to ensure they are properly formatted."""
         if not hasattr(self, "mode_type_df"):
@@ -3653,6 +3739,7 @@ class GMNSValidator:
         else:
             return None
     
+    @timed_check
     def _validate_od_connectivity(self, od_performance_file):
         """
         Validate OD connectivity based on od_performance.csv.
@@ -3820,6 +3907,7 @@ class GMNSValidator:
                 )
             )
     
+    @timed_check
     def _check_demand_od_connectivity(self, od_perf_pairs):
         """
         Check if all significant OD pairs from demand files have corresponding entries in od_performance.
@@ -4076,6 +4164,7 @@ class GMNSValidator:
                         field="accessibility"
                     )
                 )
+    @timed_check
     def _validate_od_distance_metrics(self, od_perf_df):
         """
         Validate the distance metrics in OD performance data to check for unreasonable values.
@@ -4275,6 +4364,7 @@ class GMNSValidator:
                 )
             )
         
+    @timed_check
     def _validate_route_assignments(self, route_assignment_file):
         """
         Validate route assignments from route_assignment.csv.
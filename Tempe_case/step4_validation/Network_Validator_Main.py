@@ -1,7 +1,17 @@
+import contextlib
 import os
 import sys
 import json
+
+# Stage_Timing.py is found at the root of zone2assignment, two folders up; the root is searched
+# after this folder, so a copy placed next to this file is used first
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from GMNS_Plus_Readiness_Validator import GMNSValidator, ReadinessLevel
+try:
+    from Stage_Timing import StageTimer
+except ImportError:
+    # Used on its own without Stage_Timing.py: validate without writing timings.json
+    StageTimer = None
 
 def get_all_directories(root_path):
     """Recursively search for all directories under root_path, excluding .idea and other hidden directories."""
@@ -72,16 +82,20 @@ def ReadinessChecking(working_path):
     print(f"Validation level: {level}")
 
     try:
-        # Initialize validator
-        validator = GMNSValidator(
-            node_file=node_file,
-            link_file=link_file,
-            demand_file=demand_file)
-
-        # Run validation at specified level
-        readiness_level = ReadinessLevel(level)
-        print(f"\nRunning validation at Readiness Level {level}...")
-        validator.validate(readiness_level)
+        # Time the loads and every check
+        with StageTimer() if StageTimer else contextlib.nullcontext() as timer:
+            # Initialize validator
+            validator = GMNSValidator(
+                node_file=node_file,
+                link_file=link_file,
+                demand_file=demand_file)
+
+            # Run validation at specified level
+            readiness_level = ReadinessLevel(level)
+            print(f"\nRunning validation at Readiness Level {level}...")
+            validator.validate(readiness_level)
+        if timer is not None:
+            timer.save(os.path.join(working_path, "timings.json"))
 
         # Print report to console
         validator.print_report()
@@ -0,0 +1,142 @@
+# Benchmark: link merge and streaming CSV writing of link_updated.csv
+#
+# Replicates the Tempe link_updated.csv to 2M+ links, keeping the connector geometry as
+# coordinate columns as update_and_merge_links does, and compares writing it with
+# materialize_link_geometry + to_csv against write_gmns_csv with the pandas and pyarrow
+# engines, which build the geometry and the text one chunk at a time. It also measures
+# update_and_merge_links itself on the Tempe link.csv replicated to the same size, with
+# the Tempe connectors. Each step runs in a fresh process, and its peak RSS is measured
+# from the start of the step (the peak is reset through /proc/self/clear_refs on Linux).
+#
+# Usage: python benchmarks/Benchmark_CSV_Writing.py [target_rows]
+
+import contextlib
+import io
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+from Connector_Generation import (CONNECTOR_COORD_COLUMNS, build_connected_network, materialize_link_geometry,
+                                  update_and_merge_links)
+from Read_GMNS_Data import read_gmns_table, write_gmns_csv
+
+link_file = os.path.join(repo_dir, "Tempe_case", "step3_connected_network", "link_updated.csv")
+input_folder = os.path.join(repo_dir, "Tempe_case", "step1_2_results")
+
+
+def build_links(target_rows):
+    link_df = pd.read_csv(link_file)
+    copies = -(-target_rows // len(link_df))
+    links = pd.concat([link_df] * copies, ignore_index=True)
+
+    # Connector rows keep their end coordinates instead of a WKT geometry
+    connectors = links['link_type_name'] == 'connector'
+    coordinates = links.loc[connectors, 'geometry'].str.extract(
+        r"LINESTRING \(([-\d.]+) ([-\d.]+), ([-\d.]+) ([-\d.]+)\)").astype(float)
+    for position, column in enumerate(CONNECTOR_COORD_COLUMNS):
+        links[column] = coordinates[position]
+    links.loc[connectors, 'geometry'] = None
+    return links
+
+
+def build_merge_inputs(target_rows):
+    # Copies of the Tempe links with their own node ids, and the Tempe connectors
+    node_df, link_df, zone_df = [read_gmns_table(os.path.join(input_folder, f"{name}.csv"))
+                                 for name in ('node', 'link', 'zone_centroid')]
+    with contextlib.redirect_stdout(io.StringIO()):
+        connector_links_df = build_connected_network(node_df, link_df, zone_df)['connector_links']
+    copies = -(-target_rows // len(link_df))
+    id_step = int(max(link_df['from_node_id'].max(), link_df['to_node_id'].max(), node_df['node_id'].max())) + 1
+    links = pd.concat([link_df] * copies, ignore_index=True)
+    offsets = np.repeat(np.arange(copies) * id_step, len(link_df))
+    links['from_node_id'] = links['from_node_id'].to_numpy() + offsets
+    links['to_node_id'] = links['to_node_id'].to_numpy() + offsets
+    node_ids = (node_df['node_id'].to_numpy()[None, :] + np.arange(copies)[:, None] * id_step).ravel()
+    updated_node_df = pd.DataFrame({'node_id': node_ids, 'new_node_id': node_ids + len(zone_df)})
+    return links, updated_node_df, connector_links_df
+
+
+def reset_peak_rss():
+    """Resets the peak RSS of the process where Linux allows it and returns the current RSS in MB."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        with open("/proc/self/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("VmRSS")) / 1024
+    except (OSError, StopIteration):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def peak_rss():
+    try:
+        with open("/proc/self/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("VmHWM")) / 1024
+    except (OSError, StopIteration):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_writer(task):
+    writer, target_rows, output_file = task
+    links = build_links(target_rows)
+    baseline = reset_peak_rss()
+
+    start_time = time.perf_counter()
+    if writer == "to_csv":
+        materialize_link_geometry(links).to_csv(output_file, index=False)
+    else:
+        write_gmns_csv(links, output_file, engine=writer, transform=materialize_link_geometry)
+    write_time = time.perf_counter() - start_time
+    return len(links), write_time, peak_rss() - baseline
+
+
+def run_merge(target_rows):
+    links, updated_node_df, connector_links_df = build_merge_inputs(target_rows)
+    baseline = reset_peak_rss()
+
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        link_updated_df = update_and_merge_links(links, updated_node_df, connector_links_df)
+    merge_time = time.perf_counter() - start_time
+    return (len(link_updated_df), merge_time, peak_rss() - baseline,
+            link_updated_df.memory_usage(deep=True).sum() / 1e6)
+
+
+def main():
+    target_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        rows, merge_time, merge_memory, result_size = executor.submit(run_merge, target_rows).result()
+    print(f"update_and_merge_links: {rows} links in {merge_time:.2f} seconds, "
+          f"peak RSS +{merge_memory:.0f} MB for a {result_size:.0f} MB link_updated table")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        results = {}
+        for writer in ("to_csv", "pandas", "pyarrow"):
+            output_file = os.path.join(temp_dir, f"{writer}.csv")
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                rows, write_time, extra_memory = executor.submit(run_writer, (writer, target_rows, output_file)).result()
+            results[writer] = write_time, extra_memory
+            print(f"{writer}: {rows} links in {write_time:.2f} seconds, "
+                  f"peak RSS +{extra_memory:.0f} MB over the link table")
+
+        with open(os.path.join(temp_dir, "to_csv.csv")) as f, open(os.path.join(temp_dir, "pandas.csv")) as g:
+            if f.read() != g.read():
+                raise AssertionError("Chunked pandas output differs from to_csv")
+        print("Chunked pandas output matches to_csv.")
+
+    for writer in ("pandas", "pyarrow"):
+        print(f"write_gmns_csv ({writer}): {results['to_csv'][0] / results[writer][0]:.1f}x faster, "
+              f"{results['to_csv'][1] / max(results[writer][1], 1):.1f}x less extra memory")
+
+
+if __name__ == "__main__":
+    main()
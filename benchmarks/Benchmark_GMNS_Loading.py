@@ -0,0 +1,69 @@
+# Benchmark: typed GMNS loading in Read_GMNS_Data.read_gmns_csv
+#
+# Replicates the Tempe link_updated.csv to 2M+ rows in a temporary file and compares
+# the parse time and in-memory size of pd.read_csv with default inference against
+# read_gmns_csv, with all columns, without the geometry column, and without it with the VDF
+# attributes and volumes narrowed to float32 (narrow_floats=True).
+#
+# Usage: python benchmarks/Benchmark_GMNS_Loading.py [target_rows]
+
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+from Read_GMNS_Data import read_gmns_csv
+
+link_file = os.path.join(repo_dir, "Tempe_case", "step3_connected_network", "link_updated.csv")
+
+
+def write_links(target_rows, output_file):
+    link_df = pd.read_csv(link_file)
+    copies = -(-target_rows // len(link_df))
+    with open(output_file, "w", newline="") as f:
+        link_df.to_csv(f, index=False)
+        for _ in range(copies - 1):
+            link_df.to_csv(f, index=False, header=False)
+    return copies * len(link_df)
+
+
+def measure(label, load):
+    start_time = time.perf_counter()
+    df = load()
+    load_time = time.perf_counter() - start_time
+    size = df.memory_usage(deep=True).sum() / 1e6
+    print(f"{label}: {load_time:.2f} seconds, {size:.0f} MB")
+    return load_time, size
+
+
+def main():
+    target_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        csv_file = os.path.join(temp_dir, "link.csv")
+        rows = write_links(target_rows, csv_file)
+        print(f"Benchmark file: {rows} links, {os.path.getsize(csv_file) / 1e6:.0f} MB")
+
+        columns = [column for column in pd.read_csv(csv_file, nrows=0).columns if column != "geometry"]
+        default_time, default_size = measure("pd.read_csv", lambda: pd.read_csv(csv_file, low_memory=False))
+        typed_time, typed_size = measure("read_gmns_csv", lambda: read_gmns_csv(csv_file))
+        projected_time, projected_size = measure("read_gmns_csv without geometry",
+                                                 lambda: read_gmns_csv(csv_file, columns=columns))
+        narrowed_time, narrowed_size = measure(
+            "read_gmns_csv without geometry, narrow_floats",
+            lambda: read_gmns_csv(csv_file, columns=columns, narrow_floats=True))
+
+    print(f"All columns: {default_time / typed_time:.1f}x faster, {default_size / typed_size:.1f}x smaller")
+    print(f"Without geometry: {default_time / projected_time:.1f}x faster, "
+          f"{default_size / projected_size:.1f}x smaller")
+    print(f"Without geometry, narrow_floats: {default_time / narrowed_time:.1f}x faster, "
+          f"{default_size / narrowed_size:.1f}x smaller")
+
+
+if __name__ == "__main__":
+    main()
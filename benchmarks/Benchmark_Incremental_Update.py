@@ -0,0 +1,103 @@
+# Benchmark and consistency check: Connector_Generation.build_connected_network_incremental
+#
+# Builds the Tempe network (Tempe_case/step1_2_results) once in every output format, then
+# moves a zone centroid, an activity node and two other nodes, and rebuilds it with the
+# incremental build and with a full build into a separate folder. The stored node_updated
+# and link_updated tables of both builds must hold the same values and column types, and
+# connector_links the same connectors (the incremental build keeps the link ids of
+# unchanged connectors, so those are compared by end nodes). The CSV files of
+# node_updated and link_updated, which DTALite reads in every output format, must be
+# byte-identical.
+# It exits with an AssertionError when the outputs differ.
+#
+# Usage: python benchmarks/Benchmark_Incremental_Update.py
+
+import contextlib
+import filecmp
+import io
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+from Connector_Generation import DTALITE_TABLES, build_connected_network, build_connected_network_incremental
+from Read_GMNS_Data import GMNS_TABLE_FORMATS, read_gmns_table
+
+input_folder = os.path.join(repo_dir, "Tempe_case", "step1_2_results")
+
+
+def load_inputs():
+    return [read_gmns_table(os.path.join(input_folder, f"{name}.csv")) for name in ('node', 'link', 'zone_centroid')]
+
+
+def edit_inputs(node_df, zone_df):
+    zone_df = zone_df.copy()
+    zone_df.loc[4, 'x_coord'] += 0.01
+    node_df = node_df.copy()
+    activity_rows = node_df.index[node_df['zone_id'].notna()]
+    node_df.loc[activity_rows[3], 'x_coord'] += 0.02
+    node_df.loc[100, 'y_coord'] += 0.003
+    node_df.loc[200, 'x_coord'] -= 0.05
+    return node_df, zone_df
+
+
+def timed(build):
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        build()
+    return time.perf_counter() - start_time
+
+
+def compare_outputs(full_folder, incremental_folder, output_format):
+    differences = []
+    for name in ('connector_links', 'link_updated', 'node_updated'):
+        full = read_gmns_table(os.path.join(full_folder, f"{name}.{output_format}"))
+        incremental = read_gmns_table(os.path.join(incremental_folder, f"{name}.{output_format}"))
+        if name == 'connector_links':
+            end_nodes = ['from_node_id', 'to_node_id']
+            full = full.drop(columns='link_id').sort_values(end_nodes).reset_index(drop=True)
+            incremental = incremental.drop(columns='link_id').sort_values(end_nodes).reset_index(drop=True)
+        try:
+            pd.testing.assert_frame_equal(full, incremental, check_exact=True, check_categorical=False)
+        except AssertionError as error:
+            differences.append(f"{name}.{output_format}: {str(error).splitlines()[0]}")
+    for name in DTALITE_TABLES:
+        if not filecmp.cmp(os.path.join(full_folder, f"{name}.csv"),
+                           os.path.join(incremental_folder, f"{name}.csv"), shallow=False):
+            differences.append(f"{name}.csv written with {output_format}: the text differs")
+    return differences
+
+
+def main():
+    node_df, link_df, zone_df = load_inputs()
+    edited_node_df, edited_zone_df = edit_inputs(node_df, zone_df)
+
+    differences = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for output_format in GMNS_TABLE_FORMATS:
+            incremental_folder = os.path.join(temp_dir, output_format, "incremental")
+            full_folder = os.path.join(temp_dir, output_format, "full")
+            timed(lambda: build_connected_network_incremental(node_df, link_df, zone_df, incremental_folder,
+                                                              output_format=output_format))
+            incremental_time = timed(lambda: build_connected_network_incremental(
+                edited_node_df, link_df, edited_zone_df, incremental_folder, output_format=output_format))
+            full_time = timed(lambda: build_connected_network(edited_node_df, link_df, edited_zone_df, full_folder,
+                                                              output_format=output_format))
+            format_differences = compare_outputs(full_folder, incremental_folder, output_format)
+            status = "matches the full build" if not format_differences else "DIFFERS from the full build"
+            print(f"{output_format}: full build {full_time:.2f} seconds, incremental update "
+                  f"{incremental_time:.2f} seconds, {status}")
+            differences += format_differences
+
+    if differences:
+        raise AssertionError("Incremental outputs differ from a full build:\n" + "\n".join(differences))
+    print("Incremental outputs match a full build in every format.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# Benchmark and tolerance check: connector lengths of Connector_Generation.compute_link_lengths
+#
+# Takes the end points of the Tempe connectors (Tempe_case/step3_connected_network/
+# connector_links.csv), replicated to the requested number of links, and compares the
+# vincenty, haversine and projected methods with the geodesic reference (geopy, one call
+# per link).
+# It fails when a method goes past its stated tolerance:
+#   - vincenty within VINCENTY_TOLERANCE meters of geodesic,
+#   - haversine within HAVERSINE_TOLERANCE relative error of geodesic, on the Tempe
+#     connectors and on random pairs over the whole globe,
+#   - projected within PROJECTED_TOLERANCE relative error of geodesic on the Tempe connectors,
+#   - vincenty within OUTPUT_TOLERANCE meters of the lengths in the committed
+#     connector_links.csv, which are rounded to centimeters.
+# It exits with an AssertionError when a check fails.
+#
+# Usage: python benchmarks/Benchmark_Link_Lengths.py [target_links]
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+from Connector_Generation import compute_link_lengths
+
+connector_file = os.path.join(repo_dir, "Tempe_case", "step3_connected_network", "connector_links.csv")
+
+VINCENTY_TOLERANCE = 1e-3
+HAVERSINE_TOLERANCE = 0.006
+# UTM scale error inside the zone
+PROJECTED_TOLERANCE = 0.001
+# Half a centimeter of rounding in the committed lengths, plus the vincenty tolerance
+OUTPUT_TOLERANCE = 0.005 + VINCENTY_TOLERANCE
+
+
+def load_connector_end_points():
+    connector_df = pd.read_csv(connector_file)
+    coordinates = connector_df['geometry'].str.extract(
+        r"LINESTRING \(([-\d.]+) ([-\d.]+), ([-\d.]+) ([-\d.]+)\)").astype(float)
+    end_points = [coordinates[position].to_numpy() for position in range(4)]
+    return end_points, connector_df['length'].to_numpy()
+
+
+def measure(label, end_points, method):
+    start_time = time.perf_counter()
+    lengths = compute_link_lengths(*end_points, method=method)
+    print(f"{label}: {len(lengths)} links in {time.perf_counter() - start_time:.3f} seconds")
+    return lengths
+
+
+def check(label, error, tolerance, unit):
+    status = "ok" if error <= tolerance else "FAILED"
+    print(f"{label}: max error {error:.3g} {unit} (tolerance {tolerance:g} {unit}) {status}")
+    return error <= tolerance
+
+
+def main():
+    target_links = int(sys.argv[1]) if len(sys.argv) > 1 else 30_000
+
+    end_points, committed_lengths = load_connector_end_points()
+    copies = -(-target_links // len(committed_lengths))
+    links = [np.tile(values, copies) for values in end_points]
+
+    geodesic = measure("geodesic", links, "geodesic")
+    vincenty = measure("vincenty", links, "vincenty")
+    haversine = measure("haversine", links, "haversine")
+    projected = measure("projected", links, "projected")
+
+    # Haversine errors grow with latitude and direction, so they are also checked over the globe
+    rng = np.random.default_rng(0)
+    global_pairs = [rng.uniform(-180, 180, 20_000), rng.uniform(-89, 89, 20_000),
+                    rng.uniform(-180, 180, 20_000), rng.uniform(-89, 89, 20_000)]
+    global_ratio = (compute_link_lengths(*global_pairs, method="haversine")
+                    / compute_link_lengths(*global_pairs, method="geodesic"))
+
+    results = [
+        check("vincenty vs geodesic", np.abs(vincenty - geodesic).max(), VINCENTY_TOLERANCE, "m"),
+        check("haversine vs geodesic (Tempe)", 100 * np.abs(haversine / geodesic - 1).max(),
+              100 * HAVERSINE_TOLERANCE, "%"),
+        check("haversine vs geodesic (global)", 100 * np.abs(global_ratio - 1).max(), 100 * HAVERSINE_TOLERANCE, "%"),
+        check("projected vs geodesic (Tempe)", 100 * np.abs(projected / geodesic - 1).max(),
+              100 * PROJECTED_TOLERANCE, "%"),
+        check("vincenty vs committed connector_links.csv",
+              np.abs(vincenty[:len(committed_lengths)] - committed_lengths).max(), OUTPUT_TOLERANCE, "m"),
+    ]
+    if not all(results):
+        raise AssertionError("Connector lengths are outside their tolerance")
+    print("All connector lengths are within tolerance.")
+
+
+if __name__ == "__main__":
+    main()
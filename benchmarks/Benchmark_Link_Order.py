@@ -0,0 +1,62 @@
+# Benchmark: forward-star ordering in Connector_Generation.update_and_merge_links
+#
+# Replicates the Tempe link_updated.csv to 5M+ links, giving every copy its own
+# node ids and shuffling the rows, and compares the full-table
+# sort_values(['from_node_id', 'to_node_id']) with forward_star_order, which sorts
+# the two id columns only and permutes the table once.
+#
+# Usage: python benchmarks/Benchmark_Link_Order.py [target_rows]
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+from Connector_Generation import forward_star_order
+
+link_file = os.path.join(repo_dir, "Tempe_case", "step3_connected_network", "link_updated.csv")
+
+
+def build_links(target_rows):
+    link_df = pd.read_csv(link_file)
+    copies = -(-target_rows // len(link_df))
+    id_step = int(max(link_df['from_node_id'].max(), link_df['to_node_id'].max()))
+    offsets = np.repeat(np.arange(copies) * id_step, len(link_df))
+    links = pd.concat([link_df] * copies, ignore_index=True)
+    links['from_node_id'] += offsets
+    links['to_node_id'] += offsets
+    return links.sample(frac=1, random_state=0).reset_index(drop=True)
+
+
+def main():
+    target_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+
+    links = build_links(target_rows)
+    print(f"Benchmark network: {len(links)} links, {len(links.columns)} columns")
+
+    start_time = time.perf_counter()
+    legacy = links.sort_values(by=['from_node_id', 'to_node_id']).reset_index(drop=True)
+    legacy_time = time.perf_counter() - start_time
+    print(f"sort_values on the full table: {legacy_time:.2f} seconds")
+    legacy = legacy[['from_node_id', 'to_node_id']]
+
+    start_time = time.perf_counter()
+    order = forward_star_order(links['from_node_id'].to_numpy(), links['to_node_id'].to_numpy())
+    order_time = time.perf_counter() - start_time
+    ordered = links.take(order).reset_index(drop=True)
+    ordered_time = time.perf_counter() - start_time
+    print(f"forward_star_order + take: {ordered_time:.2f} seconds ({order_time:.2f} seconds computing the order)")
+
+    for column in ('from_node_id', 'to_node_id'):
+        if not np.array_equal(legacy[column].to_numpy(), ordered[column].to_numpy()):
+            raise AssertionError(f"Orders differ in {column}")
+    print(f"Orders match. Speedup: {legacy_time / ordered_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
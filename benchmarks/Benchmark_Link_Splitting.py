@@ -0,0 +1,58 @@
+# Geometry check: links split by Connector_Generation.split_links_at_connectors
+#
+# Builds the Tempe connected network (Tempe_case/step1_2_results) in memory with
+# snap_to_links=True, so zones without activity nodes split their nearest link, and
+# checks that no line in link_updated repeats a coordinate on consecutive vertices,
+# as a piece running to the link end did when the last vertex was kept next to the
+# interpolated end point.
+# It exits with an AssertionError when a geometry has consecutive duplicate coordinates.
+#
+# Usage: python benchmarks/Benchmark_Link_Splitting.py
+
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import shapely
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+from Connector_Generation import build_connected_network
+from Read_GMNS_Data import read_gmns_table
+
+input_folder = os.path.join(repo_dir, "Tempe_case", "step1_2_results")
+
+
+def count_repeated_vertices(wkt_geometries):
+    lines = shapely.from_wkt(wkt_geometries)
+    coords, line_index = shapely.get_coordinates(lines, return_index=True)
+    repeated = (np.diff(line_index) == 0) & np.all(np.diff(coords, axis=0) == 0, axis=1)
+    return len(np.unique(line_index[1:][repeated]))
+
+
+def main():
+    node_df, link_df, zone_df = [read_gmns_table(os.path.join(input_folder, f"{name}.csv"))
+                                 for name in ('node', 'link', 'zone_centroid')]
+
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        network = build_connected_network(node_df, link_df, zone_df, snap_to_links=True)
+    build_time = time.perf_counter() - start_time
+
+    link_updated_df = network['link_updated']
+    geometries = link_updated_df['geometry'].dropna().to_numpy()
+    split_count = len(link_updated_df) - len(network['connector_links']) - len(link_df)
+    repeated = count_repeated_vertices(geometries)
+    print(f"snap_to_links: {split_count} links added by splitting in {build_time:.2f} seconds, "
+          f"{repeated} of {len(geometries)} geometries with consecutive duplicate coordinates")
+    if repeated:
+        raise AssertionError(f"{repeated} link geometries repeat a coordinate on consecutive vertices")
+    print("No link geometry repeats a coordinate.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# Benchmark: batch processing of several regions in Read_Zone_Data.process_zone_regions
+#
+# Writes a number of metro-size tract layers (tiled from data/Census_Tract_Boundary.shp by
+# Benchmark_Zone_Centroids) and a manifest listing them, then processes the manifest with
+# one worker, as running the script once per region does, and with one worker per CPU
+# (at least two). Both runs must write the same files.
+#
+# Usage: python benchmarks/Benchmark_Zone_Batch.py [regions] [zones_per_region]
+
+import filecmp
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+from Benchmark_Zone_Centroids import build_zones, taz_column
+from Read_Zone_Data import process_zone_regions
+
+
+def main():
+    region_count = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    zones_per_region = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        zones = build_zones(zones_per_region)
+        regions = [f"metro_{index:02d}" for index in range(region_count)]
+        for region in regions:
+            zones.to_file(os.path.join(temp_dir, f"{region}.shp"))
+        manifest_path = os.path.join(temp_dir, "regions.csv")
+        pd.DataFrame({
+            'region': regions,
+            'shapefile': [f"{region}.shp" for region in regions],
+            'taz_column': taz_column,
+            'zone_id_start': [index * 100_000 + 1 for index in range(region_count)],
+        }).to_csv(manifest_path, index=False)
+
+        parallel_workers = max(os.cpu_count() or 1, 2)
+        timings = {}
+        for workers in (1, parallel_workers):
+            output_folder = os.path.join(temp_dir, f"workers_{workers}")
+            start_time = time.perf_counter()
+            process_zone_regions(manifest_path, output_folder, workers=workers)
+            timings[workers] = time.perf_counter() - start_time
+
+        for region in regions:
+            for file_name in ("zone_centroid.csv", "zone_boundary.csv"):
+                if not filecmp.cmp(os.path.join(temp_dir, "workers_1", region, file_name),
+                                   os.path.join(temp_dir, f"workers_{parallel_workers}", region, file_name),
+                                   shallow=False):
+                    raise AssertionError(f"{region}/{file_name} differs between the runs")
+        print("Parallel outputs match the single worker run.")
+
+    for workers, run_time in timings.items():
+        print(f"{workers} worker(s): {region_count} regions of {len(zones)} zones in {run_time:.2f} seconds")
+    print(f"process_zone_regions: {timings[1] / timings[parallel_workers]:.1f}x faster with {parallel_workers} workers")
+
+
+if __name__ == "__main__":
+    main()
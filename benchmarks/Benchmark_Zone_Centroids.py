@@ -0,0 +1,131 @@
+# Benchmark: centroid extraction and export in Read_Zone_Data
+#
+# Tiles the Tempe census tracts (data/Census_Tract_Boundary.shp) into a national-scale
+# layer of 85k+ polygons, about the number of U.S. census tracts (pass 240000 for block
+# groups), and compares the original row-at-a-time calculate_centroids and
+# save_centroids_to_csv with the vectorized versions. The centroids must agree within
+# CENTROID_TOLERANCE (they are no longer computed in EPSG:3857), and both exports must write
+# the same file from the same centroids.
+#
+# Usage: python benchmarks/Benchmark_Zone_Centroids.py [target_zones]
+
+import csv
+import os
+import sys
+import tempfile
+import time
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from shapely.geometry import Point
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+from Read_Zone_Data import calculate_centroids, save_centroids_to_csv
+
+shapefile_path = os.path.join(repo_dir, "data", "Census_Tract_Boundary.shp")
+taz_column = "TRACTCE"
+# Largest centroid shift, in degrees (about 1 m), accepted against the former EPSG:3857 computation
+CENTROID_TOLERANCE = 1e-5
+
+
+def legacy_calculate_centroids(gdf):
+    # Version of calculate_centroids before vectorization
+    if gdf.crs.to_epsg() != 4326:
+        gdf = gdf.to_crs(epsg=4326)
+    gdf_projected = gdf.to_crs(epsg=3857)
+    centroids = gdf_projected.geometry.centroid
+    centroids_latlon = gpd.GeoSeries(centroids, crs=3857).to_crs(epsg=4326)
+    gdf = gdf.copy()
+    gdf['x_coord'] = centroids_latlon.x
+    gdf['y_coord'] = centroids_latlon.y
+    gdf['boundary'] = gdf.geometry
+    gdf['geometry'] = gdf.apply(lambda row: Point(row['x_coord'], row['y_coord']), axis=1)
+    return gpd.GeoDataFrame(gdf, geometry='geometry', crs='EPSG:4326')
+
+
+def legacy_save_centroids_to_csv(gdf, output_csv_path, taz_column):
+    # Version of save_centroids_to_csv before vectorization
+    nodes = []
+    node_id_counter = 1
+    for idx, row in gdf.iterrows():
+        if row['geometry'] is None:
+            continue
+        geometry_wkt = row['geometry'].wkt.replace("\n", " ")
+        TAZ_id = str(row[taz_column])
+        nodes.append({
+            "name": TAZ_id, "node_id": node_id_counter, "osm_node_id": "",
+            "x_coord": row['x_coord'], "y_coord": row['y_coord'], "zone_id": node_id_counter,
+            "TAZ_ID": TAZ_id, "geometry": geometry_wkt, "notes": " ",
+        })
+        node_id_counter += 1
+    nodes_df = pd.DataFrame(nodes).dropna()
+    nodes_df.to_csv(output_csv_path, index=False, quoting=csv.QUOTE_ALL, encoding='utf-8')
+
+
+def build_zones(target_zones):
+    tracts = gpd.read_file(shapefile_path).to_crs(epsg=4326)
+    copies = -(-target_zones // len(tracts))
+    columns = int(np.ceil(np.sqrt(copies)))
+    min_x, min_y, max_x, max_y = tracts.total_bounds
+
+    # Lay the copies out on a grid, each shifted by the extent of the tract layer
+    copy_index = np.repeat(np.arange(copies), len(tracts))
+    shift_x = (copy_index % columns) * (max_x - min_x)
+    shift_y = (copy_index // columns) * (max_y - min_y)
+    zones = pd.concat([tracts] * copies, ignore_index=True)
+    geometries = zones.geometry.to_numpy()
+    coordinate_counts = shapely.get_num_coordinates(geometries)
+    offsets = np.column_stack([np.repeat(shift_x, coordinate_counts), np.repeat(shift_y, coordinate_counts)])
+    coordinates = shapely.get_coordinates(geometries) + offsets
+    zones['geometry'] = shapely.set_coordinates(geometries.copy(), coordinates)
+    zones[taz_column] = (copy_index * 1_000_000 + zones[taz_column].astype(int)).astype(str)
+    return gpd.GeoDataFrame(zones, geometry='geometry', crs='EPSG:4326')
+
+
+def measure(label, calculate, save, zones, output_csv_path):
+    start_time = time.perf_counter()
+    centroids = calculate(zones)
+    calculate_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    save(centroids, output_csv_path, taz_column)
+    save_time = time.perf_counter() - start_time
+    print(f"{label}: calculate_centroids {calculate_time:.2f} seconds, "
+          f"save_centroids_to_csv {save_time:.2f} seconds")
+    return centroids, calculate_time + save_time
+
+
+def main():
+    target_zones = int(sys.argv[1]) if len(sys.argv) > 1 else 85_000
+
+    zones = build_zones(target_zones)
+    print(f"Benchmark layer: {len(zones)} zones, {shapely.get_num_coordinates(zones.geometry.to_numpy()).sum()} vertices")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        legacy_file = os.path.join(temp_dir, "legacy.csv")
+        vectorized_file = os.path.join(temp_dir, "vectorized.csv")
+        legacy_centroids, legacy_time = measure("Row loops", legacy_calculate_centroids,
+                                                legacy_save_centroids_to_csv, zones, legacy_file)
+        centroids, vectorized_time = measure("Vectorized", calculate_centroids, save_centroids_to_csv,
+                                             zones, vectorized_file)
+
+        # calculate_centroids no longer goes through EPSG:3857, so the centroids only agree within a tolerance
+        shift = max(np.abs(legacy_centroids['x_coord'].to_numpy() - centroids['x_coord'].to_numpy()).max(),
+                    np.abs(legacy_centroids['y_coord'].to_numpy() - centroids['y_coord'].to_numpy()).max())
+        if shift > CENTROID_TOLERANCE:
+            raise AssertionError(f"Centroids differ from the row loop ones by {shift:.1e} degrees")
+
+        # The export must write the same file as the row loop from the same centroids
+        legacy_save_centroids_to_csv(centroids, legacy_file, taz_column)
+        with open(legacy_file) as f, open(vectorized_file) as g:
+            if f.read() != g.read():
+                raise AssertionError("Vectorized zone_centroid.csv differs from the row loop output")
+    print(f"Outputs match, centroids within {shift:.1e} degrees. Speedup: {legacy_time / vectorized_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
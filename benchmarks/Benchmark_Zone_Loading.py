@@ -0,0 +1,63 @@
+# Benchmark: zone layer ingestion in Read_Zone_Data.load_zone_layer
+#
+# Tiles the Tempe census tracts into a statewide-size shapefile (10k+ polygons, about the
+# tract count of California) with all the attribute columns, and compares loading it whole
+# with gpd.read_file, as the script did, against load_zone_layer reading only the zone id
+# column through Arrow, with and without the extent of the Tempe network
+# (Tempe_case/step1_2_results/node.csv) as a bounding box. The bounding box read must
+# return the same zones as filtering the full layer.
+#
+# Usage: python benchmarks/Benchmark_Zone_Loading.py [target_zones]
+
+import os
+import sys
+import tempfile
+import time
+
+import geopandas as gpd
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+from Benchmark_Zone_Centroids import build_zones, taz_column
+from Read_Zone_Data import get_network_bbox, load_zone_layer
+
+node_file = os.path.join(repo_dir, "Tempe_case", "step1_2_results", "node.csv")
+
+
+def measure(label, load, repeats=3):
+    best_time = None
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        zones = load()
+        load_time = time.perf_counter() - start_time
+        best_time = load_time if best_time is None else min(best_time, load_time)
+    print(f"{label}: {len(zones)} zones, {len(zones.columns)} columns in {best_time:.3f} seconds")
+    return zones, best_time
+
+
+def main():
+    target_zones = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        shapefile_path = os.path.join(temp_dir, "statewide_tracts.shp")
+        build_zones(target_zones).to_file(shapefile_path)
+        bbox = get_network_bbox(node_file)
+
+        full, full_time = measure("read_file", lambda: gpd.read_file(shapefile_path))
+        _, columns_time = measure("load_zone_layer (columns)",
+                                  lambda: load_zone_layer(shapefile_path, columns=[taz_column]))
+        metro, metro_time = measure("load_zone_layer (columns + network bbox)",
+                                    lambda: load_zone_layer(shapefile_path, columns=[taz_column], bbox=bbox))
+
+    expected = full[full.intersects(bbox.to_crs(full.crs).iloc[0])]
+    if sorted(metro[taz_column]) != sorted(expected[taz_column]):
+        raise AssertionError("Bounding box read returned different zones than filtering the full layer")
+    print("Bounding box read matches the filtered full layer.")
+
+    print(f"load_zone_layer: {full_time / columns_time:.1f}x faster with column projection, "
+          f"{full_time / metro_time:.1f}x faster with the network bounding box")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# Benchmark: headless zone plotting in Read_Zone_Data.plot_taz_with_centroids
+#
+# Builds the tiled tract layer of Benchmark_Zone_Centroids (10k+ zones by default) and
+# compares saving the centroid plot the way the script drew it, one plt.text per zone in
+# an iterrows loop, against plot_taz_with_centroids with an output file, which draws the
+# points with one scatter call and culls colliding labels. Runs with the Agg backend.
+#
+# Usage: python benchmarks/Benchmark_Zone_Plotting.py [target_zones]
+
+import os
+import sys
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+from Benchmark_Zone_Centroids import build_zones, taz_column
+from Read_Zone_Data import calculate_centroids, plot_taz_with_centroids
+
+
+def legacy_plot_taz_with_centroids(gdf, taz_column, output_path):
+    # Version of plot_taz_with_centroids before headless rendering, saving instead of plt.show()
+    ax = gdf.plot(figsize=(12, 8), color='red', markersize=10)
+    for idx, row in gdf.iterrows():
+        plt.text(row['geometry'].x, row['geometry'].y, str(row[taz_column]),
+                 fontsize=8, ha='center', color='blue')
+    plt.title("TAZ Centroid Points", fontsize=16)
+    plt.xlabel("Longitude", fontsize=12)
+    plt.ylabel("Latitude", fontsize=12)
+    plt.grid(True)
+    plt.savefig(output_path, dpi=150, bbox_inches='tight')
+    plt.close()
+
+
+def main():
+    target_zones = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    zones = calculate_centroids(build_zones(target_zones))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        start_time = time.perf_counter()
+        legacy_plot_taz_with_centroids(zones, taz_column, os.path.join(temp_dir, "legacy.png"))
+        legacy_time = time.perf_counter() - start_time
+        print(f"Legacy plot: {len(zones)} zones in {legacy_time:.2f} seconds")
+
+        start_time = time.perf_counter()
+        plot_taz_with_centroids(zones, taz_column, output_path=os.path.join(temp_dir, "zones.png"))
+        plot_time = time.perf_counter() - start_time
+        print(f"plot_taz_with_centroids: {len(zones)} zones in {plot_time:.2f} seconds")
+
+    print(f"plot_taz_with_centroids: {legacy_time / plot_time:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
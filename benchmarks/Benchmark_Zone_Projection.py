@@ -0,0 +1,75 @@
+# Benchmark: CRS handling of Read_Zone_Data.calculate_centroids
+#
+# Builds the national-scale tract layer of Benchmark_Zone_Centroids and stores it in a
+# geographic CRS (EPSG:4269, as TIGER files ship) and in a projected one (EPSG:5070, CONUS
+# Albers). Each is run through the former pipeline, which reprojected every polygon to
+# EPSG:4326 and then to EPSG:3857 and back for the centroids, and through
+# calculate_centroids, which projects the polygons at most once for the centroids and
+# transforms only the centroid coordinates back. Each run uses a fresh process, so its
+# peak RSS is measured on its own.
+#
+# Usage: python benchmarks/Benchmark_Zone_Projection.py [target_zones]
+
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import geopandas as gpd
+import numpy as np
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+from Benchmark_Zone_Centroids import build_zones
+from Read_Zone_Data import calculate_centroids
+
+
+def legacy_calculate_centroids(gdf):
+    # Reprojection done by the script before calculate_centroids, then the former 3857 round trip
+    if gdf.crs.to_epsg() != 4326:
+        gdf = gdf.to_crs(epsg=4326)
+    centroids_latlon = gdf.geometry.to_crs(epsg=3857).centroid.to_crs(epsg=4326)
+    gdf = gdf.copy()
+    gdf['x_coord'] = centroids_latlon.x
+    gdf['y_coord'] = centroids_latlon.y
+    gdf['boundary'] = gdf.geometry
+    gdf['geometry'] = gpd.points_from_xy(gdf['x_coord'], gdf['y_coord'], crs='EPSG:4326')
+    return gdf.set_geometry('geometry', crs='EPSG:4326')
+
+
+def run_pipeline(task):
+    pipeline, epsg, target_zones = task
+    zones = build_zones(target_zones).to_crs(epsg=epsg)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start_time = time.perf_counter()
+    calculate = legacy_calculate_centroids if pipeline == "legacy" else calculate_centroids
+    centroids = calculate(zones)
+    run_time = time.perf_counter() - start_time
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return (len(zones), run_time, (peak - baseline) / 1024,
+            centroids['x_coord'].to_numpy(), centroids['y_coord'].to_numpy())
+
+
+def main():
+    target_zones = int(sys.argv[1]) if len(sys.argv) > 1 else 85_000
+
+    for epsg in (4269, 5070):
+        results = {}
+        for pipeline in ("legacy", "cached transformer"):
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                results[pipeline] = executor.submit(run_pipeline, (pipeline, epsg, target_zones)).result()
+            zones, run_time, extra_memory = results[pipeline][:3]
+            print(f"EPSG:{epsg}, {pipeline}: {zones} zones in {run_time:.2f} seconds, peak RSS +{extra_memory:.0f} MB")
+
+        shift = max(np.abs(results["legacy"][3] - results["cached transformer"][3]).max(),
+                    np.abs(results["legacy"][4] - results["cached transformer"][4]).max())
+        print(f"EPSG:{epsg}: {results['legacy'][1] / results['cached transformer'][1]:.1f}x faster, "
+              f"centroids within {shift:.1e} degrees of the EPSG:3857 ones")
+
+
+if __name__ == "__main__":
+    main()
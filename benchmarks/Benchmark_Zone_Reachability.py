@@ -0,0 +1,74 @@
+# Connectivity check: unreachable zone pairs with and without largest_scc_only
+#
+# Builds the Tempe connected network (Tempe_case/step1_2_results) in memory with the
+# default options and with largest_scc_only=True, and counts the ordered zone pairs
+# with no path between them in link_updated. Paths may not pass through another zone:
+# each zone is split into an origin with its outgoing connectors and a destination with
+# its incoming ones. With largest_scc_only every zone must reach every other zone.
+# It exits with an AssertionError when a zone pair stays unreachable.
+#
+# Usage: python benchmarks/Benchmark_Zone_Reachability.py
+
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import shortest_path
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+from Connector_Generation import build_connected_network
+from Read_GMNS_Data import read_gmns_table
+
+input_folder = os.path.join(repo_dir, "Tempe_case", "step1_2_results")
+
+
+def count_unreachable_zone_pairs(link_updated_df, zone_ids):
+    from_node_ids = link_updated_df['from_node_id'].to_numpy(dtype=np.int64)
+    to_node_ids = link_updated_df['to_node_id'].to_numpy(dtype=np.int64)
+    node_ids = np.union1d(np.union1d(from_node_ids, to_node_ids), zone_ids)
+    from_positions = np.searchsorted(node_ids, from_node_ids)
+    to_positions = np.searchsorted(node_ids, to_node_ids)
+    # Links into a zone end at its destination copy, numbered after all the nodes
+    zone_positions = np.searchsorted(node_ids, zone_ids)
+    destination_of = np.full(len(node_ids), -1)
+    destination_of[zone_positions] = len(node_ids) + np.arange(len(zone_ids))
+    into_zone = destination_of[to_positions] >= 0
+    to_positions[into_zone] = destination_of[to_positions[into_zone]]
+
+    size = len(node_ids) + len(zone_ids)
+    graph = csr_matrix((np.ones(len(from_positions)), (from_positions, to_positions)), shape=(size, size))
+    distances = shortest_path(graph, indices=zone_positions, unweighted=True)[:, len(node_ids):]
+    np.fill_diagonal(distances, 0)
+    return int(np.isinf(distances).sum())
+
+
+def main():
+    node_df, link_df, zone_df = [read_gmns_table(os.path.join(input_folder, f"{name}.csv"))
+                                 for name in ('node', 'link', 'zone_centroid')]
+    zone_ids = zone_df['node_id'].to_numpy(dtype=np.int64)
+    pair_count = len(zone_ids) * (len(zone_ids) - 1)
+
+    unreachable = {}
+    for largest_scc_only in (False, True):
+        start_time = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            network = build_connected_network(node_df, link_df, zone_df, largest_scc_only=largest_scc_only)
+        build_time = time.perf_counter() - start_time
+        unreachable[largest_scc_only] = count_unreachable_zone_pairs(network['link_updated'], zone_ids)
+        print(f"largest_scc_only={largest_scc_only}: {len(network['connector_links'])} connector links, "
+              f"{unreachable[largest_scc_only]} of {pair_count} zone pairs unreachable "
+              f"(built in {build_time:.2f} seconds)")
+
+    if unreachable[True]:
+        raise AssertionError(f"{unreachable[True]} zone pairs are unreachable with largest_scc_only")
+    print("Every zone reaches every other zone with largest_scc_only.")
+
+
+if __name__ == "__main__":
+    main()